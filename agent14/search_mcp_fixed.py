@@ -3,13 +3,20 @@ MCP Server #1: Web Search (исправленная версия с логиро
 """
 
 import json
-import requests
 import asyncio
+import os
 import sys
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
+# Общий HTTP-клиент (пул соединений, повторы, метрики) из корня репозитория
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from http_client import HttpClient
+
+# DuckDuckGo иногда отвечает секундами - дублируем зависший запрос
+http = HttpClient(retries=2, hedge_after=2.0)
+
 
 # Логирование в файл (чтобы видеть ошибки)
 def log(message):
@@ -38,7 +45,7 @@ def search_duckduckgo(query: str, num_results: int = 5) -> dict:
             "skip_disambig": 1
         }
         
-        response = requests.get(url, params=params, timeout=10)
+        response = http.get(url, params=params, timeout=10)
         data = response.json()
         
         results = {"query": query, "results": []}
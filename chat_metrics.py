@@ -0,0 +1,138 @@
+"""
+Метрики чат-бота: задержка по этапам, токены и стоимость
+Экспорт в JSON и в текстовом формате Prometheus.
+
+Использование:
+    metrics = ChatMetrics()
+    with metrics.span("search"):
+        ...
+    metrics.record_usage(model, response.usage)
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict
+
+import numpy as np
+
+# Цена за 1 млн токенов (вход, выход), USD
+MODEL_PRICING = {
+    "claude-3-haiku-20240307": (0.25, 1.25),
+    "claude-3-5-haiku-20241022": (0.80, 4.00),
+    "claude-sonnet-4-20250514": (3.00, 15.00),
+}
+
+QUANTILES = [0.5, 0.95, 0.99]
+
+
+class LatencyHistogram:
+    """Скользящее окно измерений + общие счётчики"""
+
+    def __init__(self, window: int = 1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self) -> Dict[float, float]:
+        if not self.samples:
+            return {}
+        values = np.percentile(np.array(self.samples), [q * 100 for q in QUANTILES])
+        return dict(zip(QUANTILES, values.tolist()))
+
+
+class ChatMetrics:
+    """Метрики всех вызовов ask() (общие для сессий сервера)"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self.stages: Dict[str, LatencyHistogram] = {}
+        self.tokens = {"input": 0, "output": 0}
+        self.cost_usd = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            if stage not in self.stages:
+                self.stages[stage] = LatencyHistogram(self.window)
+            self.stages[stage].observe(seconds)
+
+    @contextmanager
+    def span(self, stage: str):
+        """Замер длительности этапа"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def record_usage(self, model: str, usage) -> Dict:
+        """Учитывает response.usage от Claude, возвращает токены и стоимость вызова"""
+        input_tokens = getattr(usage, "input_tokens", 0) or 0
+        output_tokens = getattr(usage, "output_tokens", 0) or 0
+        price_in, price_out = MODEL_PRICING.get(model, (0.0, 0.0))
+        cost = (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+        with self._lock:
+            self.requests += 1
+            self.tokens["input"] += input_tokens
+            self.tokens["output"] += output_tokens
+            self.cost_usd += cost
+
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "cost_usd": cost}
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def to_dict(self) -> Dict:
+        """Метрики в JSON-совместимом виде (задержки в мс)"""
+        with self._lock:
+            stages = {}
+            for stage, histogram in self.stages.items():
+                stages[stage] = {
+                    "count": histogram.count,
+                    "avg_ms": histogram.total / histogram.count * 1000,
+                    **{f"p{int(q * 100)}_ms": v * 1000 for q, v in histogram.quantiles().items()}
+                }
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "tokens": dict(self.tokens),
+                "cost_usd": round(self.cost_usd, 6),
+                "stages": stages
+            }
+
+    def to_prometheus(self, prefix: str = "rag_chat") -> str:
+        """Метрики в текстовом формате Prometheus"""
+        with self._lock:
+            lines = [
+                f"# HELP {prefix}_stage_latency_seconds Длительность этапов ask()",
+                f"# TYPE {prefix}_stage_latency_seconds summary",
+            ]
+            for stage, histogram in self.stages.items():
+                for q, value in histogram.quantiles().items():
+                    lines.append(f'{prefix}_stage_latency_seconds{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+                lines.append(f'{prefix}_stage_latency_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+                lines.append(f'{prefix}_stage_latency_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            lines += [
+                f"# TYPE {prefix}_tokens_total counter",
+                f'{prefix}_tokens_total{{type="input"}} {self.tokens["input"]}',
+                f'{prefix}_tokens_total{{type="output"}} {self.tokens["output"]}',
+                f"# TYPE {prefix}_cost_usd_total counter",
+                f"{prefix}_cost_usd_total {self.cost_usd:.6f}",
+                f"# TYPE {prefix}_requests_total counter",
+                f"{prefix}_requests_total {self.requests}",
+                f"# TYPE {prefix}_errors_total counter",
+                f"{prefix}_errors_total {self.errors}",
+            ]
+            return "\n".join(lines) + "\n"
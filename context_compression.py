@@ -0,0 +1,118 @@
+"""
+Экстрактивное сжатие контекста перед запросом к Claude
+Найденные документы режутся на предложения, предложения оцениваются
+по сходству с запросом одним матричным умножением, в промпт попадают
+лучшие предложения в пределах бюджета токенов (в исходном порядке).
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+import numpy as np
+
+from token_budget import estimate_tokens
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Разбивает текст на предложения"""
+    return [s.strip() for s in SENTENCE_SPLIT.split(text) if s.strip()]
+
+
+class ContextCompressor:
+    """Отбор самых релевантных предложений с кэшем их эмбеддингов"""
+
+    def __init__(self, model, token_budget: int = 600, cache_size: int = 20000):
+        """
+        Args:
+            model: модель эмбеддингов (encode списка строк)
+            token_budget: сколько токенов контекста оставлять
+            cache_size: сколько эмбеддингов предложений держать в памяти
+        """
+        self.model = model
+        self.token_budget = token_budget
+        self.cache_size = cache_size
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _embed_sentences(self, sentences: List[str]) -> np.ndarray:
+        """Нормализованные эмбеддинги; новые предложения кодируются одним батчем"""
+        # Найденное в кэше копируем сразу: пока кодируются новые предложения,
+        # другой запрос может вытеснить их из кэша
+        found, missing = {}, []
+        with self._lock:
+            for sentence in dict.fromkeys(sentences):
+                if sentence in self._cache:
+                    self._cache.move_to_end(sentence)
+                    found[sentence] = self._cache[sentence]
+                else:
+                    missing.append(sentence)
+
+        if missing:
+            embeddings = self.model.encode(missing)
+            embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+            with self._lock:
+                for sentence, embedding in zip(missing, embeddings):
+                    self._cache[sentence] = embedding
+                    found[sentence] = embedding
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return np.stack([found[sentence] for sentence in sentences])
+
+    def compress(self, documents: List[Dict], query_embedding: np.ndarray) -> List[Dict]:
+        """
+        Оставляет лучшие предложения документов в пределах бюджета
+
+        Returns:
+            Копии документов с сокращённым content ("excerpt": True, если что-то вырезано).
+            Документы без отобранных предложений не возвращаются.
+        """
+        if not documents:
+            return []
+
+        sentences = []
+        owners = []
+        for doc_index, doc in enumerate(documents):
+            for sentence in split_sentences(doc["content"]):
+                sentences.append(sentence)
+                owners.append(doc_index)
+
+        if not sentences:
+            return documents
+
+        query_norm = query_embedding / np.linalg.norm(query_embedding)
+        scores = self._embed_sentences(sentences) @ query_norm
+
+        # Жадно берём предложения по убыванию релевантности
+        selected = set()
+        used = 0
+        for i in np.argsort(scores)[::-1]:
+            tokens = estimate_tokens(sentences[i])
+            if selected and used + tokens > self.token_budget:
+                continue
+            selected.add(int(i))
+            used += tokens
+
+        # Собираем выдержки в исходном порядке предложений
+        parts = [[] for _ in documents]
+        totals = [0] * len(documents)
+        for i, doc_index in enumerate(owners):
+            totals[doc_index] += 1
+            if i in selected:
+                parts[doc_index].append(sentences[i])
+
+        compressed = []
+        for doc, doc_parts, total in zip(documents, parts, totals):
+            if not doc_parts:
+                continue
+            doc = doc.copy()
+            doc["content"] = " ".join(doc_parts)
+            doc["excerpt"] = len(doc_parts) < total
+            compressed.append(doc)
+
+        return compressed
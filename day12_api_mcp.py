@@ -1,42 +1,34 @@
 import os
-import requests
+import sys
 from datetime import datetime
 from anthropic import Anthropic
 from dotenv import load_dotenv
 
+from http_client import HttpClient, get_default_client
+
+# Геокодер с кэшем общий с weather-project
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "weather-project"))
+from geocoder import Geocoder
+from tool_runner import ToolRunner
+
 load_dotenv()
 
 
 class WeatherTool:
     """Инструмент для получения погоды"""
     
-    def __init__(self):
+    def __init__(self, geocoder: Geocoder = None, http: HttpClient = None):
         self.name = "get_weather"
         self.description = "Получает текущую погоду для любого города"
+        # Соединения с Open-Meteo переиспользуются, сбои сети повторяются
+        self.http = http or get_default_client()
+        self.forecast_url = "https://api.open-meteo.com/v1/forecast"
+        # Координаты берутся из кэша/справочника, API геокодирования - только для новых городов
+        self.geocoder = geocoder or Geocoder(http=self.http)
     
     def geocode_city(self, city_name: str) -> dict:
         """Находит координаты города"""
-        try:
-            url = "https://geocoding-api.open-meteo.com/v1/search"
-            params = {"name": city_name, "count": 1, "language": "ru", "format": "json"}
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            if "results" not in data or len(data["results"]) == 0:
-                return None
-            
-            result = data["results"][0]
-            return {
-                "name": result["name"],
-                "country": result.get("country", "Unknown"),
-                "latitude": result["latitude"],
-                "longitude": result["longitude"],
-                "admin1": result.get("admin1", ""),
-            }
-        except Exception:
-            return None
+        return self.geocoder.lookup(city_name)
     
     def get_weather(self, city: str) -> dict:
         """Получает погоду из Open-Meteo API"""
@@ -45,7 +37,6 @@ class WeatherTool:
             if location is None:
                 return {"error": f"Город '{city}' не найден"}
             
-            url = "https://api.open-meteo.com/v1/forecast"
             params = {
                 "latitude": location["latitude"],
                 "longitude": location["longitude"],
@@ -53,7 +44,7 @@ class WeatherTool:
                 "timezone": "auto"
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.http.get(self.forecast_url, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -136,6 +127,8 @@ class ClaudeAgent:
         self.client = Anthropic(api_key=api_key)
         self.mcp_server = mcp_server
         self.conversation_history = []
+        # Все tool_use одного ответа выполняются параллельно
+        self.tool_runner = ToolRunner(self.mcp_server.call_tool)
     
     def chat(self, user_message: str) -> str:
         """Отправляет сообщение Claude"""
@@ -153,12 +146,12 @@ class ClaudeAgent:
         )
         
         while response.stop_reason == "tool_use":
-            tool_use = None
+            tool_uses = []
             assistant_message = []
             
             for block in response.content:
                 if block.type == "tool_use":
-                    tool_use = block
+                    tool_uses.append(block)
                     print(f"\n[Claude] Вызов инструмента: {block.name}")
                     print(f"[Claude] Аргументы: {block.input}")
                 assistant_message.append(block)
@@ -168,23 +161,16 @@ class ClaudeAgent:
                 "content": assistant_message
             })
             
-            if tool_use:
-                # Вызываем инструмент через MCP
-                print(f"[MCP] Обработка запроса...")
-                tool_result = self.mcp_server.call_tool(
-                    tool_name=tool_use.name,
-                    arguments=tool_use.input
-                )
-                print(f"[MCP] Результат получен")
+            if tool_uses:
+                # Вызываем все инструменты через MCP одновременно
+                print(f"[MCP] Обработка запросов: {len(tool_uses)}...")
+                tool_results = self.tool_runner.run(tool_uses)
+                print(f"[MCP] Результаты получены")
                 
-                # Отправляем результат Claude
+                # Все результаты - одним сообщением
                 self.conversation_history.append({
                     "role": "user",
-                    "content": [{
-                        "type": "tool_result",
-                        "tool_use_id": tool_use.id,
-                        "content": tool_result
-                    }]
+                    "content": tool_results
                 })
                 
                 # Получаем финальный ответ
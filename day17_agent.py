@@ -7,6 +7,7 @@ import numpy as np
 from sentence_transformers import SentenceTransformer
 import chromadb
 import json
+from index_loader import MountedIndexes, index_paths_from_env
 
 # ===== ЗАГРУЗКА API КЛЮЧА =====
 load_dotenv()
@@ -17,13 +18,16 @@ if not api_key:
     exit(1)
 
 class ClaudeRAGAgent:
-    def __init__(self, api_key: str = None, model: str = "claude-3-haiku-20240307"):
+    def __init__(self, api_key: str = None, model: str = "claude-3-haiku-20240307",
+                 index_paths: List[str] = None, expand_tokens: int = 0):
         """
         Инициализация RAG-агента с Claude
         
         Args:
             api_key: Ключ для Anthropic
             model: Название модели Claude (haiku, sonnet, opus)
+            index_paths: готовые индексы Agent 16 вместо встроенных документов
+            expand_tokens: сколько токенов добавлять соседними чанками (для index_paths)
         """
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         if not self.api_key:
@@ -32,6 +36,16 @@ class ClaudeRAGAgent:
         self.client = Anthropic(api_key=self.api_key)
         self.model = model
         
+        # Готовые индексы: эмбеддинги уже посчитаны, запрос кодируется моделью индекса
+        self.mounted = None
+        self.expand_tokens = expand_tokens
+        if index_paths:
+            self.mounted = MountedIndexes(index_paths)
+            self.embedding_model = self.mounted.model
+            self.collection = None
+            self.sample_documents = []
+            return
+        
         # Модель для эмбеддингов
         print("Загрузка модели для эмбеддингов...")
         self.embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
@@ -187,6 +201,11 @@ class ClaudeRAGAgent:
     
     def search_relevant_chunks(self, query: str, top_k: int = 3) -> List[str]:
         """Поиск релевантных чанков по запросу"""
+        if self.mounted:
+            # Соседние чанки одного файла приходят одним фрагментом
+            spans = self.mounted.search_merged(query, top_k, expand_tokens=self.expand_tokens)
+            return [span["text"] for span, _ in spans]
+        
         if self.collection:
             # Используем ChromaDB если доступна
             try:
@@ -441,7 +460,8 @@ if __name__ == "__main__":
         # Инициализация с более простой моделью для начала
         agent = ClaudeRAGAgent(
             api_key=api_key,
-            model="claude-3-haiku-20240307"
+            model="claude-3-haiku-20240307",
+            index_paths=index_paths_from_env()
         )
         
         print("\n" + "="*60)
@@ -3,6 +3,7 @@ from dotenv import load_dotenv
 import os
 import numpy as np
 from sentence_transformers import SentenceTransformer
+from index_loader import MountedIndexes, index_paths_from_env
 
 # ===== ЗАГРУЗКА API КЛЮЧА =====
 load_dotenv()
@@ -14,11 +15,32 @@ if not api_key:
 
 # Простой RAG с фильтрацией
 class SimpleRAG:
-    def __init__(self):
+    def __init__(self, index_paths=None):
+        """
+        Args:
+            index_paths: готовые индексы Agent 16 вместо встроенных документов
+        """
         print("Инициализация RAG системы...")
         
         self.client = Anthropic(api_key=api_key)
         
+        # Готовые индексы: эмбеддинги уже нормализованы, запрос кодируется моделью индекса
+        if index_paths:
+            mounted = MountedIndexes(index_paths)
+            self.embedding_model = mounted.model
+            self.documents = mounted.texts
+            self.document_embeddings = mounted.embeddings
+            self.normalized_embeddings = mounted.embeddings
+            self.merger = mounted.merger
+            # По индексу фрагмента, а не по тексту: одинаковые тексты встречаются в разных источниках
+            self._chunks = mounted.chunks
+            
+            print(f"Система готова! Загружено {len(self.documents)} фрагментов из индексов")
+            print("-" * 50)
+            return
+        
+        self.merger = None
+        
         # Загружаем модель для эмбеддингов
         print("🔄 Загрузка модели для эмбеддингов...")
         self.embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
@@ -43,30 +65,55 @@ class SimpleRAG:
         print("Создание эмбеддингов для документов...")
         self.document_embeddings = self.embedding_model.encode(self.documents)
         
+        # Нормализуем один раз: дальше косинусное сходство - это просто скалярное произведение
+        self.normalized_embeddings = self.document_embeddings / np.linalg.norm(
+            self.document_embeddings, axis=1, keepdims=True
+        )
+        
         print(f"Система готова! Загружено {len(self.documents)} документов")
         print("-" * 50)
     
-    def calculate_similarity(self, query, document_embeddings):
-        """Вычисление косинусного сходства"""
+    def encode_query(self, query):
+        """Эмбеддинг запроса (нормализованный)"""
         query_embedding = self.embedding_model.encode(query)
+        return query_embedding / np.linalg.norm(query_embedding)
+    
+    def encode_queries(self, queries):
+        """Эмбеддинги нескольких запросов за один вызов модели"""
+        query_embeddings = self.embedding_model.encode(list(queries))
+        return query_embeddings / np.linalg.norm(query_embeddings, axis=1, keepdims=True)
+    
+    def calculate_similarity(self, query=None, query_embedding=None):
+        """Вычисление косинусного сходства"""
+        if query_embedding is None:
+            query_embedding = self.encode_query(query)
         
-        # Нормализация векторов
-        query_norm = query_embedding / np.linalg.norm(query_embedding)
-        doc_norms = document_embeddings / np.linalg.norm(document_embeddings, axis=1, keepdims=True)
+        # Документы уже нормализованы в __init__
+        return self.normalized_embeddings @ query_embedding
+    
+    def _select_top(self, similarities, top_k, threshold=None):
+        """Индексы топ-K документов (с порогом или без), по убыванию сходства"""
+        if threshold is None:
+            candidates = np.arange(len(similarities))
+        else:
+            candidates = np.flatnonzero(similarities >= threshold)
         
-        # Косинусное сходство
-        similarities = np.dot(doc_norms, query_norm)
-        return similarities
+        if len(candidates) > top_k:
+            # argpartition выбирает топ-K за O(n), сортируем только их
+            part = np.argpartition(similarities[candidates], -top_k)[-top_k:]
+            candidates = candidates[part]
+        
+        return candidates[np.argsort(similarities[candidates])[::-1]]
     
-    def search_without_filter(self, query, top_k=5):
+    def search_without_filter(self, query, top_k=5, query_embedding=None):
         """Поиск без фильтрации"""
         print(f"\n🔍 ПОИСК БЕЗ ФИЛЬТРАЦИИ")
         print(f"Запрос: '{query}'")
         
-        similarities = self.calculate_similarity(query, self.document_embeddings)
+        similarities = self.calculate_similarity(query, query_embedding)
         
         # Получаем топ-K документов
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        top_indices = self._select_top(similarities, top_k)
         
         print(f"Найдено документов: {len(top_indices)}")
         print("Топ документы:")
@@ -75,47 +122,70 @@ class SimpleRAG:
         for i, idx in enumerate(top_indices, 1):
             similarity = similarities[idx]
             doc = self.documents[idx]
-            results.append((doc, similarity))
+            results.append((doc, similarity, idx))
             
             print(f"{i}. [Сходство: {similarity:.3f}] {doc}")
         
         return results
     
-    def search_with_filter(self, query, threshold=0.5, top_k=10):
+    def search_with_filter(self, query, threshold=0.5, top_k=10, query_embedding=None):
         """Поиск с фильтрацией по порогу"""
         print(f"\nПОИСК С ФИЛЬТРАЦИЕЙ (порог: {threshold})")
         print(f"Запрос: '{query}'")
         
-        similarities = self.calculate_similarity(query, self.document_embeddings)
+        similarities = self.calculate_similarity(query, query_embedding)
         
         # Фильтрация по порогу
-        filtered_indices = [i for i, sim in enumerate(similarities) if sim >= threshold]
+        filtered_count = int(np.count_nonzero(similarities >= threshold))
         
-        if not filtered_indices:
+        if not filtered_count:
             print(f"❌ Нет документов с сходством >= {threshold}")
             return []
         
-        # Сортируем отфильтрованные документы
-        filtered_similarities = [similarities[i] for i in filtered_indices]
-        sorted_indices = [x for _, x in sorted(zip(filtered_similarities, filtered_indices), reverse=True)]
-        
-        # Берем топ-K
-        top_indices = sorted_indices[:top_k]
+        # Берем топ-K из отфильтрованных
+        top_indices = self._select_top(similarities, top_k, threshold)
         
         print(f"Всего документов: {len(self.documents)}")
-        print(f"После фильтрации: {len(top_indices)}/{len(filtered_indices)}")
+        print(f"После фильтрации: {len(top_indices)}/{filtered_count}")
         print("Отфильтрованные документы:")
         
         results = []
         for i, idx in enumerate(top_indices, 1):
             similarity = similarities[idx]
             doc = self.documents[idx]
-            results.append((doc, similarity))
+            results.append((doc, similarity, idx))
             
             print(f"{i}. [Сходство: {similarity:.3f}] {doc}")
         
         return results
     
+    def search_batch(self, queries, threshold=None, top_k=5):
+        """Пакетный поиск без вывода: один вызов модели и одно матричное умножение"""
+        if not queries:
+            return []
+        
+        similarities = self.encode_queries(queries) @ self.normalized_embeddings.T
+        
+        batch_results = []
+        for row in similarities:
+            top_indices = self._select_top(row, top_k, threshold)
+            batch_results.append([(self.documents[idx], row[idx], idx) for idx in top_indices])
+        
+        return batch_results
+    
+    def build_context(self, results):
+        """
+        Контекст для Claude; соседние чанки индекса склеиваются без повторов
+        
+        Args:
+            results: [(текст, сходство, индекс фрагмента)] из search_*
+        """
+        if not self.merger:
+            return "\n".join([doc for doc, _, _ in results])
+        
+        hits = [(self._chunks[idx], score) for _, score, idx in results]
+        return "\n".join([span["text"] for span, _ in self.merger.merge(hits)])
+    
     def ask_claude(self, query, context=""):
         """Запрос к Claude"""
         try:
@@ -150,22 +220,25 @@ class SimpleRAG:
         print("СРАВНЕНИЕ ПОДХОДОВ")
         print("="*60)
         
+        # Эмбеддинг запроса считаем один раз для обоих подходов
+        query_embedding = self.encode_query(query)
+        
         # 1. Без фильтрации
         print("\n1️⃣  БЕЗ ФИЛЬТРАЦИИ:")
-        results_no_filter = self.search_without_filter(query)
+        results_no_filter = self.search_without_filter(query, query_embedding=query_embedding)
         
         if results_no_filter:
-            context_no_filter = "\n".join([doc for doc, _ in results_no_filter[:3]])
+            context_no_filter = self.build_context(results_no_filter[:3])
             answer_no_filter = self.ask_claude(query, context_no_filter)
             print(f"\nОТВЕТ БЕЗ ФИЛЬТРАЦИИ:")
             print(answer_no_filter)
         
         # 2. С фильтрацией
         print("\n2️⃣  С ФИЛЬТРАЦИЕЙ (порог 0.5):")
-        results_with_filter = self.search_with_filter(query, threshold=0.5)
+        results_with_filter = self.search_with_filter(query, threshold=0.5, query_embedding=query_embedding)
         
         if results_with_filter:
-            context_with_filter = "\n".join([doc for doc, _ in results_with_filter[:3]])
+            context_with_filter = self.build_context(results_with_filter[:3])
             answer_with_filter = self.ask_claude(query, context_with_filter)
             print(f"\n📝 ОТВЕТ С ФИЛЬТРАЦИЕЙ:")
             print(answer_with_filter)
@@ -209,7 +282,7 @@ def main():
     print("="*60)
     
     # Создаем RAG систему
-    rag = SimpleRAG()
+    rag = SimpleRAG(index_paths=index_paths_from_env())
     
     # Тестовые вопросы
     test_questions = [
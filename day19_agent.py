@@ -1,11 +1,20 @@
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
+import asyncio
 from dotenv import load_dotenv
 import os
+import sys
+import threading
 import numpy as np
 from sentence_transformers import SentenceTransformer
 import json
 from datetime import datetime
 from typing import List, Dict, Tuple
+from token_budget import estimate_tokens, trim_messages_to_budget
+from session_journal import SessionJournal
+from knowledge_store import KnowledgeStore, KnowledgeSnapshot
+from index_loader import ChunkMerger, MountedIndexes, index_paths_from_env
+from chat_metrics import ChatMetrics
+from context_compression import ContextCompressor
 
 # ===== ЗАГРУЗКА API КЛЮЧА =====
 load_dotenv()
@@ -15,28 +24,49 @@ if not api_key:
     print("Ошибка: API ключ не найден!")
     exit(1)
 
+SYSTEM_PROMPT = """Ты - ассистент компании NeuroTech, который отвечает на вопросы сотрудников и клиентов на основе базы знаний компании.
+
+ИНСТРУКЦИИ:
+1. Ответь на вопрос, используя предоставленную информацию из базы знаний
+2. Если информации недостаточно, так и скажи
+3. Будь точным и конкретным
+4. Используй факты и цифры из документов
+5. Отвечай на русском языке"""
+
+
 class RAGChatBot:
-    def __init__(self):
-        print("🤖 Инициализация RAG чат-бота...")
-        
-        # Инициализация Claude
-        self.client = Anthropic(api_key=api_key)
-        self.model = "claude-3-haiku-20240307"
-        
-        # Модель для эмбеддингов
-        print("🔄 Загрузка модели для поиска...")
-        self.embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-        
-        # База знаний компании
-        self.knowledge_base = self._create_knowledge_base()
-        
-        # Создаем эмбеддинги для базы знаний
-        print("📝 Индексация документов...")
-        self.knowledge_texts = [doc["content"] for doc in self.knowledge_base]
-        self.knowledge_embeddings = self.embedding_model.encode(self.knowledge_texts)
+    def __init__(self, history_token_budget: int = 3000, session_id: str = None,
+                 journal_dir: str = "sessions", shared: "RAGChatBot" = None,
+                 knowledge_path: str = None, context_token_budget: int = 600,
+                 index_paths: List[str] = None, expand_tokens: int = 0):
+        """
+        Args:
+            history_token_budget: сколько токенов истории диалога отправлять Claude
+            session_id: ID сессии для продолжения (None - новая сессия)
+            journal_dir: папка с журналами сессий
+            shared: бот, у которого берутся клиенты, модель и база знаний
+                    (для сервера: одна модель на все сессии)
+            knowledge_path: JSON-файл или папка с базой знаний
+                            (None - встроенные документы)
+            context_token_budget: бюджет токенов на выдержки из документов
+                                  (None - документы целиком)
+            index_paths: готовые индексы Agent 16 вместо базы знаний
+            expand_tokens: сколько токенов добавлять соседними чанками найденных
+                           фрагментов (только для index_paths)
+        """
+        if knowledge_path and index_paths:
+            raise ValueError("Укажите либо knowledge_path, либо index_paths")
+        
+        if shared is not None:
+            self._share_resources(shared)
+        else:
+            self._load_resources(knowledge_path, context_token_budget, index_paths)
+        
+        self.expand_tokens = expand_tokens
         
         # История диалога
         self.conversation_history = []
+        self.history_token_budget = history_token_budget
         
         # Статистика
         self.stats = {
@@ -45,9 +75,108 @@ class RAGChatBot:
             "sessions": 1
         }
         
-        print("✅ RAG чат-бот готов к работе!")
-        print(f"📚 База знаний: {len(self.knowledge_base)} документов")
-        print("-" * 60)
+        # Журнал сессии: каждый ход дописывается на диск
+        self.journal = SessionJournal(session_id, directory=journal_dir)
+        # close() и запись хода из пула потоков не должны пересекаться
+        self._journal_lock = threading.Lock()
+        self.closed = False
+        if session_id and self.journal.exists():
+            self.conversation_history, saved_stats = self.journal.load()
+            if saved_stats:
+                self.stats = saved_stats
+                self.stats["sessions"] += 1
+            if shared is None:
+                print(f"♻️  Сессия {session_id} восстановлена: {len(self.conversation_history)} сообщений")
+        
+        if shared is None:
+            print("✅ RAG чат-бот готов к работе!")
+            print(f"📚 База знаний: {len(self.knowledge_base)} документов")
+            print("-" * 60)
+    
+    def _load_resources(self, knowledge_path: str = None, context_token_budget: int = 600,
+                        index_paths: List[str] = None):
+        """Загрузка клиентов Claude, модели эмбеддингов и базы знаний"""
+        print("🤖 Инициализация RAG чат-бота...")
+        
+        # Инициализация Claude
+        self.client = Anthropic(api_key=api_key)
+        self.async_client = AsyncAnthropic(api_key=api_key)
+        self.model = "claude-3-haiku-20240307"
+        
+        # Готовые индексы: запросы кодируются моделью, записанной в индексе
+        mounted = MountedIndexes(index_paths) if index_paths else None
+        
+        # Модель для эмбеддингов
+        if mounted:
+            self.embedding_model = mounted.model
+            embedding_model_name = mounted.model_name
+        else:
+            print("🔄 Загрузка модели для поиска...")
+            embedding_model_name = 'sentence-transformers/all-MiniLM-L6-v2'
+            self.embedding_model = SentenceTransformer(embedding_model_name)
+        
+        # Соседние чанки индекса склеиваются после поиска (у базы знаний чанков нет)
+        self.chunk_merger = None
+        
+        # Эмбеддинг запросов: модель или EmbeddingService с тем же encode()
+        self.query_encoder = self.embedding_model
+        
+        # Задержка этапов ask(), токены и стоимость
+        self.metrics = ChatMetrics()
+        
+        # Сжатие контекста: в промпт идут только лучшие предложения документов
+        self.compressor = None
+        if context_token_budget:
+            self.compressor = ContextCompressor(self.embedding_model, token_budget=context_token_budget)
+        
+        # База знаний: эмбеддинги берутся из индекса или из кэша рядом с данными
+        if mounted:
+            documents = mounted.as_documents()
+            self.chunk_merger = ChunkMerger(documents, text_key="content")
+            self.knowledge = KnowledgeStore(
+                self.embedding_model,
+                embedding_model_name,
+                preloaded=KnowledgeSnapshot(documents, mounted.embeddings)
+            )
+        else:
+            print("📝 Индексация документов...")
+            self.knowledge = KnowledgeStore(
+                self.embedding_model,
+                embedding_model_name,
+                source=knowledge_path,
+                default_documents=self._create_knowledge_base()
+            )
+    
+    def _share_resources(self, shared: "RAGChatBot"):
+        """Использовать уже загруженные ресурсы другого бота (без копирования)"""
+        self.client = shared.client
+        self.async_client = shared.async_client
+        self.model = shared.model
+        self.embedding_model = shared.embedding_model
+        self.query_encoder = shared.query_encoder
+        self.metrics = shared.metrics
+        self.compressor = shared.compressor
+        self.chunk_merger = shared.chunk_merger
+        self.knowledge = shared.knowledge
+    
+    @property
+    def knowledge_base(self) -> List[Dict]:
+        return self.knowledge.snapshot.documents
+    
+    @property
+    def knowledge_texts(self) -> List[str]:
+        return self.knowledge.snapshot.texts
+    
+    @property
+    def knowledge_embeddings(self) -> np.ndarray:
+        return self.knowledge.snapshot.embeddings
+    
+    def reload_knowledge_base(self) -> Dict:
+        """Горячая перезагрузка базы знаний (кодируются только изменения)"""
+        result = self.knowledge.reload()
+        print(f"🔄 База знаний: {result['documents']} документов, "
+              f"закодировано {result['encoded']}, удалено {result['removed']}")
+        return result
     
     def _create_knowledge_base(self) -> List[Dict]:
         """Создание базы знаний"""
@@ -110,24 +239,32 @@ class RAGChatBot:
             }
         ]
     
-    def _search_in_knowledge_base(self, query: str, top_k: int = 3) -> List[Dict]:
+    def _search_in_knowledge_base(self, query: str, top_k: int = 3,
+                                  query_embedding: np.ndarray = None) -> List[Dict]:
         """Поиск релевантных документов в базе знаний"""
         # Эмбеддинг запроса
-        query_embedding = self.embedding_model.encode(query)
+        if query_embedding is None:
+            query_embedding = self.query_encoder.encode(query)
         
-        # Нормализация
+        # Один срез базы на весь поиск (база может перезагружаться параллельно)
+        snapshot = self.knowledge.snapshot
+        if not snapshot.documents:
+            return []
+        
+        # Нормализация (документы нормализованы при загрузке)
         query_norm = query_embedding / np.linalg.norm(query_embedding)
-        doc_norms = self.knowledge_embeddings / np.linalg.norm(self.knowledge_embeddings, axis=1, keepdims=True)
         
         # Косинусное сходство
-        similarities = np.dot(doc_norms, query_norm)
+        similarities = snapshot.normalized @ query_norm
         
         # Получаем топ-K документов
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        top_k = min(top_k, len(similarities))
+        top_indices = np.argpartition(similarities, -top_k)[-top_k:]
+        top_indices = top_indices[np.argsort(similarities[top_indices])[::-1]]
         
         results = []
         for idx in top_indices:
-            doc = self.knowledge_base[idx].copy()
+            doc = snapshot.documents[idx].copy()
             doc["similarity"] = float(similarities[idx])
             doc["relevance_percent"] = int(similarities[idx] * 100)
             results.append(doc)
@@ -135,23 +272,51 @@ class RAGChatBot:
         # Фильтруем по порогу релевантности
         threshold = 0.4
         filtered_results = [doc for doc in results if doc["similarity"] >= threshold]
+        results = filtered_results if filtered_results else results[:1]  # Возвращаем хотя бы один
         
-        return filtered_results if filtered_results else results[:1]  # Возвращаем хотя бы один
-    
-    def _format_conversation_history(self, max_messages: int = 6) -> str:
-        """Форматирование истории диалога"""
-        if not self.conversation_history:
-            return ""
+        if self.chunk_merger:
+            results = self._merge_adjacent_chunks(results)
         
-        # Берем последние N сообщений
-        recent_history = self.conversation_history[-max_messages:]
+        return results
+    
+    def _merge_adjacent_chunks(self, results: List[Dict]) -> List[Dict]:
+        """Соседние чанки одного файла - один документ без повторного перекрытия"""
+        spans = self.chunk_merger.merge([(doc, doc["similarity"]) for doc in results],
+                                        expand_tokens=self.expand_tokens)
+        
+        merged = []
+        for span, similarity in spans:
+            first, last = span["chunk_ids"][0], span["chunk_ids"][-1]
+            if last != first:
+                span["id"] = f"{span['index']}/{span['filename']}#{first}-{last}"
+                span["title"] = f"{span['filename']} (фрагменты {first + 1}-{last + 1})"
+            span["similarity"] = similarity
+            span["relevance_percent"] = int(similarity * 100)
+            merged.append(span)
+        return merged
+    
+    def _build_history_messages(self) -> Tuple[List[Dict], set]:
+        """
+        История диалога в виде сообщений Claude API в пределах бюджета токенов
+
+        Returns:
+            (сообщения, id документов, чей текст уже есть в этих сообщениях)
+        """
+        # Последний элемент - текущий вопрос, он добавляется отдельно
+        past = self.conversation_history[:-1]
+        
+        # В API отправляем то, что реально уходило Claude (с контекстом), а не сырой вопрос
+        messages = [
+            {"role": msg["role"], "content": msg.get("prompt", msg["content"])}
+            for msg in past
+        ]
+        messages = trim_messages_to_budget(messages, self.history_token_budget)
         
-        formatted = "ИСТОРИЯ ДИАЛОГА:\n"
-        for msg in recent_history:
-            role = "Пользователь" if msg["role"] == "user" else "Ассистент"
-            formatted += f"{role}: {msg['content']}\n"
+        sent_doc_ids = set()
+        for msg in past[len(past) - len(messages):]:
+            sent_doc_ids.update(msg.get("context_docs", []))
         
-        return formatted
+        return messages, sent_doc_ids
     
     def _format_sources(self, sources: List[Dict]) -> str:
         """Форматирование источников для ответа"""
@@ -169,70 +334,54 @@ class RAGChatBot:
         
         return formatted
     
-    def ask(self, user_message: str) -> Dict:
-        """Основной метод для обработки вопроса пользователя"""
-        print(f"\n{'='*60}")
-        print(f"💬 ВОПРОС: {user_message}")
-        print(f"{'='*60}")
-        
-        # Добавляем вопрос в историю
+    def _prepare_turn(self, user_message: str, relevant_docs: List[Dict]) -> List[Dict]:
+        """Добавляет вопрос в историю и собирает сообщения для Claude"""
         self.conversation_history.append({
             "role": "user",
             "content": user_message,
             "timestamp": datetime.now().isoformat()
         })
         
-        # Шаг 1: Поиск в базе знаний
-        print("🔍 Поиск релевантной информации...")
-        relevant_docs = self._search_in_knowledge_base(user_message)
+        # История диалога и документы, которые Claude уже видел в ней
+        history_messages, sent_doc_ids = self._build_history_messages()
         
-        print(f"✅ Найдено релевантных документов: {len(relevant_docs)}")
-        for doc in relevant_docs:
-            print(f"   • {doc['title']} ({doc['relevance_percent']}% релевантности)")
-        
-        # Шаг 2: Формируем контекст
+        # Контекст: полный текст только для новых документов
         context = "ИНФОРМАЦИЯ ИЗ БАЗЫ ЗНАНИЙ КОМПАНИИ:\n\n"
+        context_docs = []
         for doc in relevant_docs:
             context += f"Документ: {doc['title']}\n"
-            context += f"Содержание: {doc['content']}\n\n"
-        
-        # Шаг 3: Формируем промпт с историей
-        history = self._format_conversation_history()
-        
-        prompt = f"""{history}
-
-{context}
-
-ТЕКУЩИЙ ВОПРОС ПОЛЬЗОВАТЕЛЯ: {user_message}
-
-ИНСТРУКЦИИ:
-1. Ответь на вопрос, используя предоставленную информацию из базы знаний
-2. Если информации недостаточно, так и скажи
-3. Будь точным и конкретным
-4. Используй факты и цифры из документов
-5. Отвечай на русском языке
-
-ОТВЕТ:"""
-        
-        # Шаг 4: Запрос к Claude
-        print("🤖 Генерация ответа...")
-        try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=1000,
-                temperature=0.3,
-                system="Ты - ассистент компании NeuroTech, который отвечает на вопросы сотрудников и клиентов на основе базы знаний компании.",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            
-            answer = response.content[0].text
-            
-        except Exception as e:
-            answer = f"Извините, произошла ошибка при обработке запроса: {str(e)}"
-        
-        # Шаг 5: Форматируем финальный ответ с источниками
+            if doc["id"] in sent_doc_ids:
+                context += "Содержание: приведено выше в диалоге\n\n"
+            elif doc.get("excerpt"):
+                # Выдержка под текущий вопрос - в следующих ходах отбирается заново
+                context += f"Выдержка: {doc['content']}\n\n"
+            else:
+                context += f"Содержание: {doc['content']}\n\n"
+                context_docs.append(doc["id"])
+        
+        prompt = f"""{context}
+ТЕКУЩИЙ ВОПРОС ПОЛЬЗОВАТЕЛЯ: {user_message}"""
+        
+        self.conversation_history[-1]["prompt"] = prompt
+        self.conversation_history[-1]["context_docs"] = context_docs
+        
+        return history_messages + [{"role": "user", "content": prompt}]
+    
+    def _compress_context(self, relevant_docs: List[Dict], query_embedding: np.ndarray) -> List[Dict]:
+        """Выдержки из документов под запрос (или документы целиком, если сжатие выключено)"""
+        if self.compressor is None:
+            return relevant_docs
+        return self.compressor.compress(relevant_docs, query_embedding)
+    
+    def _complete_turn(self, answer: str, relevant_docs: List[Dict], usage: Dict = None,
+                       persist: bool = True) -> Dict:
+        """
+        Сохраняет ответ в историю, статистику и журнал
+        
+        Args:
+            persist: сразу дописать ход в журнал (False - вызывающий сделает
+                     это сам через _persist_turn, например в пуле потоков)
+        """
         sources_text = self._format_sources(relevant_docs)
         full_response = f"{answer}\n\n{sources_text}"
         
@@ -247,6 +396,13 @@ class RAGChatBot:
         # Обновляем статистику
         self.stats["questions_asked"] += 1
         self.stats["documents_used"] += len(relevant_docs)
+        if usage:
+            self.stats["input_tokens"] = self.stats.get("input_tokens", 0) + usage["input_tokens"]
+            self.stats["output_tokens"] = self.stats.get("output_tokens", 0) + usage["output_tokens"]
+            self.stats["cost_usd"] = self.stats.get("cost_usd", 0.0) + usage["cost_usd"]
+        
+        if persist:
+            self._persist_turn()
         
         return {
             "answer": answer,
@@ -256,22 +412,167 @@ class RAGChatBot:
             "stats": self.stats.copy()
         }
     
+    def _persist_turn(self):
+        """Дописывает последний ход в журнал сессии (и сворачивает журнал, если пора)"""
+        with self._journal_lock:
+            # Сессию закрыли, пока шёл ответ: журнал не открываем заново
+            if self.closed:
+                return
+            self.journal.append_turn(self.conversation_history[-2:], self.stats)
+            if self.journal.needs_compaction():
+                self.journal.compact(self.conversation_history, self.stats)
+    
+    def ask(self, user_message: str) -> Dict:
+        """Основной метод для обработки вопроса пользователя"""
+        print(f"\n{'='*60}")
+        print(f"💬 ВОПРОС: {user_message}")
+        print(f"{'='*60}")
+        
+        with self.metrics.span("total"):
+            # Шаг 1: Поиск в базе знаний
+            print("🔍 Поиск релевантной информации...")
+            with self.metrics.span("embed"):
+                query_embedding = self.query_encoder.encode(user_message)
+            with self.metrics.span("search"):
+                relevant_docs = self._search_in_knowledge_base(user_message, query_embedding=query_embedding)
+            
+            print(f"✅ Найдено релевантных документов: {len(relevant_docs)}")
+            for doc in relevant_docs:
+                print(f"   • {doc['title']} ({doc['relevance_percent']}% релевантности)")
+            
+            # Шаг 2: Выдержки - только предложения, отвечающие на вопрос
+            with self.metrics.span("compress"):
+                prompt_docs = self._compress_context(relevant_docs, query_embedding)
+            
+            if self.compressor is not None:
+                before = sum(estimate_tokens(doc["content"]) for doc in relevant_docs)
+                after = sum(estimate_tokens(doc["content"]) for doc in prompt_docs)
+                print(f"✂️  Контекст сжат: ~{before} → ~{after} токенов")
+            
+            # Шаг 3: Вопрос в историю, контекст и история для Claude
+            with self.metrics.span("prompt"):
+                messages = self._prepare_turn(user_message, prompt_docs)
+            
+            # Шаг 4: Запрос к Claude
+            print("🤖 Генерация ответа...")
+            print(f"   История: {len(messages) - 1} сообщений, ~{sum(estimate_tokens(m['content']) for m in messages[:-1])} токенов")
+            usage = None
+            try:
+                with self.metrics.span("claude"):
+                    response = self.client.messages.create(
+                        model=self.model,
+                        max_tokens=1000,
+                        temperature=0.3,
+                        system=SYSTEM_PROMPT,
+                        messages=messages
+                    )
+                
+                answer = response.content[0].text
+                usage = self.metrics.record_usage(self.model, response.usage)
+                
+            except Exception as e:
+                self.metrics.record_error()
+                answer = f"Извините, произошла ошибка при обработке запроса: {str(e)}"
+            
+            # Шаг 5: Ответ с источниками, история и журнал
+            return self._complete_turn(answer, prompt_docs, usage)
+    
+    async def ask_async(self, user_message: str, executor=None) -> Dict:
+        """
+        Асинхронная версия ask() без вывода в консоль (для сервера)
+        
+        Args:
+            executor: пул потоков для CPU-нагрузки (эмбеддинг запроса и поиск)
+        """
+        loop = asyncio.get_running_loop()
+        
+        with self.metrics.span("total"):
+            # EmbeddingService объединяет запросы разных сессий в один батч
+            with self.metrics.span("embed"):
+                if hasattr(self.query_encoder, "encode_async"):
+                    query_embedding = await self.query_encoder.encode_async(user_message)
+                else:
+                    query_embedding = await loop.run_in_executor(
+                        executor, self.query_encoder.encode, user_message
+                    )
+            
+            with self.metrics.span("search"):
+                relevant_docs = await loop.run_in_executor(
+                    executor, self._search_in_knowledge_base, user_message, 3, query_embedding
+                )
+            
+            with self.metrics.span("compress"):
+                prompt_docs = await loop.run_in_executor(
+                    executor, self._compress_context, relevant_docs, query_embedding
+                )
+            
+            with self.metrics.span("prompt"):
+                messages = self._prepare_turn(user_message, prompt_docs)
+            
+            usage = None
+            try:
+                with self.metrics.span("claude"):
+                    response = await self.async_client.messages.create(
+                        model=self.model,
+                        max_tokens=1000,
+                        temperature=0.3,
+                        system=SYSTEM_PROMPT,
+                        messages=messages
+                    )
+                
+                answer = response.content[0].text
+                usage = self.metrics.record_usage(self.model, response.usage)
+                
+            except Exception as e:
+                self.metrics.record_error()
+                answer = f"Извините, произошла ошибка при обработке запроса: {str(e)}"
+            
+            result = self._complete_turn(answer, prompt_docs, usage, persist=False)
+            # Запись на диск (fsync, снимок) - в пуле потоков, цикл событий не ждёт
+            await loop.run_in_executor(executor, self._persist_turn)
+            return result
+    
     def clear_history(self):
         """Очистка истории диалога"""
         self.conversation_history = []
+        self.journal.append_clear(self.stats)
         print("🗑️  История диалога очищена")
     
+    def compact_session(self):
+        """Свернуть журнал сессии в снимок"""
+        self.journal.compact(self.conversation_history, self.stats)
+        print(f"🗜️  Журнал сессии {self.journal.session_id} свёрнут в снимок")
+    
+    def close(self):
+        """Сбросить журнал сессии на диск"""
+        with self._journal_lock:
+            self.closed = True
+            self.journal.close()
+    
     def show_stats(self):
         """Показать статистику"""
         print("\n📊 СТАТИСТИКА ЧАТ-БОТА:")
         print(f"   • Задано вопросов: {self.stats['questions_asked']}")
         print(f"   • Использовано документов: {self.stats['documents_used']}")
         print(f"   • Сессий: {self.stats['sessions']}")
+        print(f"   • ID сессии: {self.journal.session_id}")
         print(f"   • Сообщений в истории: {len(self.conversation_history)}")
         
+        if "input_tokens" in self.stats:
+            print(f"   • Токены: {self.stats['input_tokens']} вход / {self.stats['output_tokens']} выход")
+            print(f"   • Стоимость: ${self.stats['cost_usd']:.4f}")
+        
         if self.conversation_history:
             last_time = self.conversation_history[-1]['timestamp']
             print(f"   • Последнее сообщение: {last_time[:19]}")
+        
+        metrics = self.metrics.to_dict()
+        if metrics["stages"]:
+            print("\n⏱️  ЗАДЕРЖКА ПО ЭТАПАМ (мс):")
+            print(f"   {'Этап':<8} {'n':<6} {'p50':<9} {'p95':<9} {'p99':<9}")
+            for stage, values in metrics["stages"].items():
+                print(f"   {stage:<8} {values['count']:<6} {values['p50_ms']:<9.1f} "
+                      f"{values['p95_ms']:<9.1f} {values['p99_ms']:<9.1f}")
     
     def save_conversation(self, filename: str = None):
         """Сохранение диалога в файл"""
@@ -311,8 +612,14 @@ def main():
     print("Отвечаю на вопросы о компании, используя базу знаний.")
     print("="*60)
     
-    # Создаем бота
-    bot = RAGChatBot()
+    # Создаем бота (ID сессии в аргументах - продолжить сохранённую)
+    session_id = sys.argv[1] if len(sys.argv) > 1 else None
+    # Внешняя база знаний (файл или папка) задаётся в .env: RAG_KNOWLEDGE_PATH=...
+    # или готовые индексы Agent 16: RAG_INDEX_PATHS=...
+    bot = RAGChatBot(session_id=session_id, knowledge_path=os.getenv("RAG_KNOWLEDGE_PATH"),
+                     index_paths=index_paths_from_env())
+    bot.knowledge.start_watching()
+    print(f"🆔 Сессия: {bot.journal.session_id}")
     
     # Демонстрационные вопросы для примера
     demo_questions = [
@@ -331,9 +638,13 @@ def main():
     print("🎮 КОМАНДЫ ЧАТА:")
     print("   /help     - Показать помощь")
     print("   /stats    - Показать статистику")
+    print("   /metrics  - Метрики в формате Prometheus")
     print("   /clear    - Очистить историю")
     print("   /save     - Сохранить диалог")
+    print("   /sessions - Список сохранённых сессий")
+    print("   /compact  - Свернуть журнал сессии")
     print("   /kb       - Показать базу знаний")
+    print("   /reload   - Перезагрузить базу знаний")
     print("   /demo     - Запустить демо-диалог")
     print("   /exit     - Выйти из чата")
     print("="*60)
@@ -351,6 +662,7 @@ def main():
             if user_input.lower() == '/exit':
                 print("\n👋 До свидания! Спасибо за общение!")
                 bot.save_conversation()
+                bot.close()
                 break
             
             elif user_input.lower() == '/help':
@@ -368,6 +680,10 @@ def main():
                 bot.show_stats()
                 continue
             
+            elif user_input.lower() == '/metrics':
+                print(bot.metrics.to_prometheus())
+                continue
+            
             elif user_input.lower() == '/clear':
                 bot.clear_history()
                 continue
@@ -377,6 +693,22 @@ def main():
                 print(f"✅ Диалог сохранен как {filename}")
                 continue
             
+            elif user_input.lower() == '/sessions':
+                sessions = SessionJournal.list_sessions(bot.journal.directory)
+                print(f"\n🗂️  Сохранённые сессии ({len(sessions)}):")
+                for sid in sessions:
+                    print(f"   • {sid}")
+                print("   Продолжить: python day19_agent.py <ID>")
+                continue
+            
+            elif user_input.lower() == '/compact':
+                bot.compact_session()
+                continue
+            
+            elif user_input.lower() == '/reload':
+                bot.reload_knowledge_base()
+                continue
+            
             elif user_input.lower() == '/kb':
                 bot.show_knowledge_base()
                 continue
@@ -428,6 +760,7 @@ def main():
             save = input("Сохранить диалог перед выходом? (да/нет): ").lower()
             if save in ['да', 'д', 'yes', 'y']:
                 bot.save_conversation()
+            bot.close()
             print("👋 До свидания!")
             break
         
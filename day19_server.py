@@ -0,0 +1,286 @@
+"""
+HTTP-сервер для RAG чат-бота (много сессий в одном процессе)
+Одна модель эмбеддингов и одна матрица базы знаний на все сессии,
+запросы к Claude через AsyncAnthropic, эмбеддинг запроса - в пуле потоков.
+
+Запуск:
+    python day19_server.py [порт]
+
+API (JSON):
+    POST   /sessions               - новая сессия -> {"session_id": ...}
+    POST   /reload                 - перезагрузить базу знаний (RAG_KNOWLEDGE_PATH)
+    POST   /sessions/<id>/ask      - {"message": "..."} -> ответ с источниками
+    GET    /sessions/<id>/stats    - статистика сессии
+    DELETE /sessions/<id>          - закрыть сессию (журнал остаётся на диске)
+    GET    /health                 - состояние сервера
+    GET    /metrics                - метрики в формате Prometheus (/metrics.json - JSON)
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from day19_agent import RAGChatBot
+from index_loader import index_paths_from_env
+from embedding_service import EmbeddingService
+from session_journal import SessionJournal
+
+HTTP_STATUS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+class ChatServer:
+    """Асинхронный HTTP-сервер с общими ресурсами и сессиями в памяти"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8019,
+                 max_workers: int = 4, idle_timeout: int = 1800,
+                 journal_dir: str = "sessions", knowledge_path: str = None,
+                 index_paths: List[str] = None):
+        """
+        Args:
+            host, port: адрес сервера
+            max_workers: потоки для эмбеддинга запросов
+            idle_timeout: через сколько секунд простоя выгружать сессию из памяти
+            journal_dir: папка с журналами сессий
+            knowledge_path: JSON-файл или папка с базой знаний (проверяется на изменения)
+            index_paths: готовые индексы Agent 16 вместо базы знаний
+        """
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.journal_dir = journal_dir
+
+        # Модель и база знаний загружаются один раз
+        self.engine = RAGChatBot(journal_dir=journal_dir, knowledge_path=knowledge_path,
+                                 index_paths=index_paths)
+        self.engine.knowledge.start_watching()
+        # Запросы всех сессий к модели эмбеддингов собираются в батчи
+        self.engine.query_encoder = EmbeddingService(self.engine.embedding_model)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        self.sessions: Dict[str, RAGChatBot] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.last_used: Dict[str, float] = {}
+        # Сессии, которые сейчас читаются с диска (чтобы не загрузить дважды)
+        self.loading: Dict[str, asyncio.Future] = {}
+
+    def _create_session(self, session_id: str = None) -> RAGChatBot:
+        return RAGChatBot(session_id=session_id, journal_dir=self.journal_dir, shared=self.engine)
+
+    async def _get_session(self, session_id: str = None) -> RAGChatBot:
+        """Сессия из памяти, из журнала на диске или новая"""
+        if session_id in self.sessions:
+            bot = self.sessions[session_id]
+        elif session_id in self.loading:
+            bot = await asyncio.shield(self.loading[session_id])
+        else:
+            # Чтение журнала и снимка - в пуле потоков, другие сессии не ждут диск
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, self._create_session, session_id)
+            if session_id is not None:
+                self.loading[session_id] = future
+            try:
+                bot = await future
+            finally:
+                self.loading.pop(session_id, None)
+            session_id = bot.journal.session_id
+            self.sessions[session_id] = bot
+            self.locks[session_id] = asyncio.Lock()
+
+        self.last_used[bot.journal.session_id] = time.monotonic()
+        return bot
+
+    async def _close_session(self, session_id: str):
+        bot = self.sessions.pop(session_id)
+        self.locks.pop(session_id, None)
+        self.last_used.pop(session_id, None)
+        # fsync журнала - в пуле потоков
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, bot.close)
+
+    async def _evict_idle_sessions(self):
+        """Выгружает простаивающие сессии (их можно продолжить по ID)"""
+        while True:
+            await asyncio.sleep(60)
+            now = time.monotonic()
+            for session_id, last_used in list(self.last_used.items()):
+                if (session_id in self.sessions and now - last_used > self.idle_timeout
+                        and not self.locks[session_id].locked()):
+                    await self._close_session(session_id)
+
+    async def _route(self, method: str, path: str, body: Dict) -> Tuple[int, Dict]:
+        """Обработка одного запроса API"""
+        parts = [p for p in path.split("/") if p]
+
+        if parts == ["health"] and method == "GET":
+            return 200, {
+                "status": "ok",
+                "sessions": len(self.sessions),
+                "embeddings": self.engine.query_encoder.metrics()
+            }
+
+        if parts == ["metrics"] and method == "GET":
+            return 200, self.engine.metrics.to_prometheus()
+
+        if parts == ["metrics.json"] and method == "GET":
+            return 200, self.engine.metrics.to_dict()
+
+        if parts == ["reload"] and method == "POST":
+            # Кодирование новых документов - в пуле потоков, ответы продолжаются
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, self.engine.knowledge.reload)
+            return 200, result
+
+        if parts == ["sessions"] and method == "POST":
+            bot = await self._get_session()
+            return 201, {"session_id": bot.journal.session_id}
+
+        if len(parts) >= 2 and parts[0] == "sessions":
+            session_id = parts[1]
+            known = session_id in self.sessions or (
+                session_id.replace("_", "").isalnum()
+                and SessionJournal(session_id, directory=self.journal_dir).exists()
+            )
+            if not known:
+                return 404, {"error": f"Сессия {session_id} не найдена"}
+
+            if len(parts) == 2 and method == "DELETE":
+                if session_id in self.sessions:
+                    # Дожидаемся хода, который сейчас выполняется, и только потом закрываем
+                    async with self.locks[session_id]:
+                        if session_id in self.sessions:
+                            await self._close_session(session_id)
+                return 200, {"session_id": session_id, "closed": True}
+
+            if len(parts) == 3 and parts[2] == "ask" and method == "POST":
+                message = (body or {}).get("message", "").strip()
+                if not message:
+                    return 400, {"error": "Поле 'message' обязательно"}
+
+                bot = await self._get_session(session_id)
+                # Ходы одной сессии выполняются по очереди, разные сессии - параллельно
+                async with self.locks[session_id]:
+                    if bot.closed:
+                        # Сессию удалили, пока вопрос ждал своей очереди
+                        return 404, {"error": f"Сессия {session_id} закрыта"}
+                    result = await bot.ask_async(message, executor=self.executor)
+                return 200, {
+                    "session_id": session_id,
+                    "answer": result["answer"],
+                    "sources": result["sources"],
+                    "stats": result["stats"]
+                }
+
+            if len(parts) == 3 and parts[2] == "stats" and method == "GET":
+                bot = await self._get_session(session_id)
+                return 200, {
+                    "session_id": session_id,
+                    "stats": bot.stats,
+                    "messages": len(bot.conversation_history)
+                }
+
+            return 405, {"error": f"{method} {path} не поддерживается"}
+
+        return 404, {"error": f"Неизвестный путь: {path}"}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Минимальный HTTP/1.1 с keep-alive"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                raw_body = await reader.readexactly(length) if length else b""
+
+                try:
+                    body = json.loads(raw_body) if raw_body else {}
+                    status, payload = await self._route(method, path.split("?")[0], body)
+                except json.JSONDecodeError:
+                    status, payload = 400, {"error": "Некорректный JSON"}
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+
+                if isinstance(payload, str):
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                    data = payload.encode("utf-8")
+                else:
+                    content_type = "application/json; charset=utf-8"
+                    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                writer.write(
+                    f"HTTP/1.1 {status} {HTTP_STATUS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    .encode("latin-1") + data
+                )
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """Запуск сервера"""
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        eviction = asyncio.create_task(self._evict_idle_sessions())
+
+        print(f"🌐 Сервер запущен: http://{self.host}:{self.port}")
+        print(f"🧵 Потоков для эмбеддингов: {self.executor._max_workers}")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            eviction.cancel()
+            # При остановке цикл событий уже не обслуживает запросы - закрываем напрямую
+            for session_id in list(self.sessions):
+                self.sessions.pop(session_id).close()
+            self.executor.shutdown(wait=False)
+            self.engine.query_encoder.close()
+            self.engine.knowledge.stop_watching()
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8019
+
+    print("💬 НЕЙРОТЕХ ЧАТ-БОТ - РЕЖИМ СЕРВЕРА")
+    print("=" * 60)
+
+    server = ChatServer(port=port, knowledge_path=os.getenv("RAG_KNOWLEDGE_PATH"),
+                        index_paths=index_paths_from_env())
+
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        print("\n👋 Сервер остановлен")
+
+
+if __name__ == "__main__":
+    main()
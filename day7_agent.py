@@ -2,7 +2,10 @@ from anthropic import Anthropic
 from dotenv import load_dotenv
 import os
 import time
-import requests
+# Общий HTTP-клиент (пул соединений, повторы, метрики)
+from http_client import get_default_client
+
+http = get_default_client()
 
 load_dotenv()
 claude_key = os.getenv("ANTHROPIC_API_KEY")
@@ -39,7 +42,7 @@ def test_claude(prompt):
 def test_openrouter(prompt, model_id, model_name):
     print(f"{model_name}...")
     start = time.time()
-    response = requests.post(
+    response = http.post(
         "https://openrouter.ai/api/v1/chat/completions",
         headers={"Authorization": f"Bearer {openrouter_key}"},
         json={"model": model_id, "messages": [{"role": "user", "content": prompt}], "max_tokens": 500},
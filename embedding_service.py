@@ -0,0 +1,161 @@
+"""
+Сервис эмбеддингов с микро-батчингом
+Собирает одновременные запросы encode() из потоков и asyncio-задач
+в течение короткого окна (несколько мс) и считает их одним батчем.
+
+Использование (вместо model.encode(query)):
+    service = EmbeddingService(model)
+    embedding = service.encode("вопрос")              # из потока
+    embedding = await service.encode_async("вопрос")  # из asyncio
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+from typing import Dict, List, Union
+
+import numpy as np
+
+
+class EmbeddingService:
+    """Объединяет одиночные encode() в батчи"""
+
+    def __init__(self, model, window_ms: float = 5, max_batch_size: int = 64,
+                 metrics_window: int = 1000):
+        """
+        Args:
+            model: модель с методом encode(list[str]) (SentenceTransformer)
+            window_ms: сколько ждать остальные запросы после первого
+            max_batch_size: максимальный размер батча
+            metrics_window: сколько последних батчей/запросов хранить для метрик
+        """
+        self.model = model
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+
+        self._queue = queue.Queue()
+        self._stopped = False
+
+        # Метрики
+        self._lock = threading.Lock()
+        self._batch_sizes = deque(maxlen=metrics_window)
+        self._latencies = deque(maxlen=metrics_window)
+        self._requests = 0
+        self._batches = 0
+
+        self._worker = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        """Ставит текст в очередь, возвращает Future с эмбеддингом"""
+        if self._stopped:
+            raise RuntimeError("EmbeddingService остановлен")
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def encode(self, texts: Union[str, List[str]]) -> np.ndarray:
+        """Блокирующий encode с тем же результатом, что у модели"""
+        if isinstance(texts, str):
+            return self.submit(texts).result()
+        futures = [self.submit(text) for text in texts]
+        return np.stack([future.result() for future in futures])
+
+    async def encode_async(self, text: str) -> np.ndarray:
+        """encode для asyncio: не блокирует цикл событий"""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _collect_batch(self) -> List:
+        """Первый запрос ждём сколько угодно, остальные - не дольше окна"""
+        first = self._queue.get()
+        if first is None:
+            return []
+
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                # Досчитываем собранное, потом останавливаемся
+                self._queue.put(None)
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if not batch:
+                break
+            # Отменённые запросы (например, отменённая задача encode_async) не считаем;
+            # после set_running_or_notify_cancel() отменить Future уже нельзя
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            texts = [text for text, _, _ in batch]
+            try:
+                embeddings = self.model.encode(texts)
+            except Exception as e:
+                for _, future, _ in batch:
+                    self._resolve(future, exception=e)
+                continue
+
+            done = time.perf_counter()
+            for (_, future, submitted), embedding in zip(batch, embeddings):
+                self._resolve(future, result=embedding)
+
+            with self._lock:
+                self._batches += 1
+                self._requests += len(batch)
+                self._batch_sizes.append(len(batch))
+                self._latencies.extend(done - submitted for _, _, submitted in batch)
+
+    @staticmethod
+    def _resolve(future: Future, result=None, exception: Exception = None):
+        """Отдаёт результат, не роняя поток из-за одного Future"""
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def metrics(self) -> Dict:
+        """Глубина очереди, размер батчей и задержка запросов"""
+        with self._lock:
+            batch_sizes = np.array(self._batch_sizes)
+            latencies_ms = np.array(self._latencies) * 1000
+            result = {
+                "queue_depth": self._queue.qsize(),
+                "requests": self._requests,
+                "batches": self._batches,
+            }
+
+        if len(batch_sizes):
+            result["batch_size_avg"] = float(batch_sizes.mean())
+            result["batch_size_max"] = int(batch_sizes.max())
+        if len(latencies_ms):
+            result["latency_p50_ms"] = float(np.percentile(latencies_ms, 50))
+            result["latency_p95_ms"] = float(np.percentile(latencies_ms, 95))
+
+        return result
+
+    def close(self):
+        """Досчитывает очередь и останавливает поток"""
+        if not self._stopped:
+            self._stopped = True
+            self._queue.put(None)
+            self._worker.join()
@@ -0,0 +1,251 @@
+"""
+Общий HTTP-клиент для внешних API (Open-Meteo, Telegram, DuckDuckGo, OpenRouter)
+    - keep-alive: соединения с каждым хостом переиспользуются из пула
+    - повторы с экспоненциальной задержкой и джиттером (429, 5xx, сбои сети)
+    - хеджирование: если GET долго не отвечает, параллельно отправляется
+      второй такой же запрос и берётся ответ, пришедший первым
+    - метрики задержки по хостам
+
+Использование:
+    http = get_default_client()
+    response = http.get("https://api.open-meteo.com/v1/forecast", params={...})
+    print(http.metrics())
+
+Для проверки достаточно локального сервера-заглушки:
+    http = HttpClient(retries=2, backoff=0.01)
+    http.get("http://127.0.0.1:8080/flaky")
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# Ответы, после которых запрос имеет смысл повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def _never_connected(error: requests.exceptions.RequestException) -> bool:
+    """Соединение не было установлено - сервер точно не получил запрос"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError) or not error.args:
+        return False
+    # requests оборачивает ошибку urllib3: MaxRetryError(reason=NewConnectionError)
+    reason = getattr(error.args[0], "reason", error.args[0])
+    return isinstance(reason, NewConnectionError)
+
+
+class HostStats:
+    """Счётчики и скользящее окно задержек одного хоста"""
+
+    def __init__(self, window: int = 1000):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.hedges = 0
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        values = sorted(self.latencies)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def to_dict(self) -> Dict:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class HttpClient:
+    """requests.Session с пулом соединений, повторами и хеджированием"""
+
+    def __init__(self, retries: int = 3, backoff: float = 0.3, max_backoff: float = 10.0,
+                 timeout: float = 10, hedge_after: float = None, pool_size: int = 10,
+                 metrics_window: int = 1000):
+        """
+        Args:
+            retries: сколько раз повторять запрос после неудачи
+            backoff: базовая задержка перед повтором, сек (растёт как 2^попытка)
+            max_backoff: верхняя граница задержки (и для Retry-After)
+            timeout: таймаут запроса по умолчанию, сек
+            hedge_after: через сколько секунд без ответа отправлять дублирующий GET
+                         (None - без хеджирования)
+            pool_size: сколько соединений держать открытыми с одним хостом
+            metrics_window: сколько последних задержек хранить для перцентилей
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.metrics_window = metrics_window
+
+        # Повторы делаем сами (с метриками), адаптер только держит пул
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._stats: Dict[str, HostStats] = {}
+        self._lock = threading.Lock()
+        self._hedge_pool = None
+
+    def _host_stats(self, host: str) -> HostStats:
+        with self._lock:
+            if host not in self._stats:
+                self._stats[host] = HostStats(self.metrics_window)
+            return self._stats[host]
+
+    def _delay(self, attempt: int, response: requests.Response = None) -> float:
+        """Задержка перед повтором: Retry-After от сервера или джиттер до backoff * 2^attempt"""
+        if response is not None and response.headers.get("Retry-After"):
+            try:
+                return min(float(response.headers["Retry-After"]), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _send(self, method: str, url: str, stats: HostStats, **kwargs) -> requests.Response:
+        """Один запрос с замером задержки"""
+        start = time.perf_counter()
+        try:
+            return self.session.request(method, url, **kwargs)
+        finally:
+            with self._lock:
+                stats.requests += 1
+                stats.latencies.append(time.perf_counter() - start)
+
+    def _send_hedged(self, method: str, url: str, stats: HostStats,
+                     hedge_after: float, **kwargs) -> requests.Response:
+        """Если ответа нет за hedge_after, отправляет дубль и берёт первый ответ"""
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="http-hedge")
+
+        first = self._hedge_pool.submit(self._send, method, url, stats, **kwargs)
+        done, _ = wait([first], timeout=hedge_after)
+        if done:
+            return first.result()
+
+        with self._lock:
+            stats.hedges += 1
+        second = self._hedge_pool.submit(self._send, method, url, stats, **kwargs)
+        pending = {first, second}
+
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # Проигравший запрос закрываем, когда он завершится
+                    for other in pending:
+                        other.add_done_callback(
+                            lambda f: f.exception() is None and f.result().close())
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def request(self, method: str, url: str, idempotent: bool = None,
+                hedge_after: float = None, retries: int = None, **kwargs) -> requests.Response:
+        """
+        HTTP-запрос с повторами
+
+        Args:
+            method: GET, POST, ...
+            url: полный адрес
+            idempotent: можно ли безопасно повторять запрос после ответа 5xx или обрыва
+                        (по умолчанию - по методу; неидемпотентные повторяются
+                        только после 429 и если соединение не установилось)
+            hedge_after: переопределяет хеджирование клиента для этого запроса
+            retries: переопределяет число повторов (0 - повторяет вызывающий)
+            **kwargs: параметры requests (params, data, json, headers, timeout)
+
+        Returns:
+            Последний ответ сервера (статус не проверяется - raise_for_status у вызывающего)
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        if hedge_after is None:
+            hedge_after = self.hedge_after
+        if retries is None:
+            retries = self.retries
+        kwargs.setdefault("timeout", self.timeout)
+
+        stats = self._host_stats(urlsplit(url).netloc)
+
+        for attempt in range(retries + 1):
+            last_attempt = attempt == retries
+            try:
+                if hedge_after and idempotent:
+                    response = self._send_hedged(method, url, stats, hedge_after, **kwargs)
+                else:
+                    response = self._send(method, url, stats, **kwargs)
+            except requests.exceptions.RequestException as e:
+                with self._lock:
+                    stats.errors += 1
+                # Идемпотентный запрос повторяем после любого сбоя. Неидемпотентный - только
+                # если соединение не установилось: после обрыва (в т.ч. закрытого сервером
+                # keep-alive) сервер мог уже выполнить запрос
+                retryable = idempotent or _never_connected(e)
+                if last_attempt or not retryable:
+                    raise
+                delay = self._delay(attempt)
+            else:
+                retryable = response.status_code == 429 or (
+                    idempotent and response.status_code in RETRY_STATUSES)
+                if last_attempt or not retryable:
+                    return response
+                with self._lock:
+                    stats.errors += 1
+                delay = self._delay(attempt, response)
+                response.close()
+
+            with self._lock:
+                stats.retries += 1
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Метрики по хостам"""
+        with self._lock:
+            return {host: stats.to_dict() for host, stats in self._stats.items()}
+
+    def close(self):
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        self.session.close()
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_default_client() -> HttpClient:
+    """Один клиент (и один пул соединений) на процесс"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
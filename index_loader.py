@@ -0,0 +1,249 @@
+"""
+Подключение готовых индексов Agent 16 к агентам day17/18/19
+Индекс (document_index.json) уже содержит чанки и эмбеддинги - агенту
+не нужно ничего кодировать при старте. Запросы кодируются той же
+моделью, что записана в индексе (config.model), иначе векторы несравнимы.
+
+Использование:
+    mounted = MountedIndexes(["Agent 16/document_index.json"])
+    for chunk, score in mounted.search("Что такое RAG?", top_k=3):
+        print(chunk["filename"], score)
+
+    # Соседние чанки одного файла склеиваются без повторного перекрытия
+    for span, score in mounted.search_merged("Что такое RAG?", top_k=3, expand_tokens=200):
+        print(span["filename"], span["chunk_ids"], score)
+
+В .env можно указать индексы для агентов (через ';' на Windows, ':' на Linux):
+    RAG_INDEX_PATHS=Agent 16/document_index.json
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from token_budget import estimate_tokens
+
+# split_into_chunks режет с перекрытием 50 символов; после strip() оно
+# может сдвинуться на пару пробелов, поэтому ищем с запасом
+MAX_OVERLAP = 60
+# Совпадение короче - случайность, а не перекрытие чанков
+MIN_OVERLAP = 10
+
+# Модели, уже загруженные в этом процессе (по имени из индекса)
+_MODELS: Dict[str, object] = {}
+
+
+def get_model(model_name: str):
+    """SentenceTransformer по имени, один экземпляр на процесс"""
+    if model_name not in _MODELS:
+        from sentence_transformers import SentenceTransformer
+        print(f"🔄 Загрузка модели индекса: {model_name}")
+        _MODELS[model_name] = SentenceTransformer(model_name)
+    return _MODELS[model_name]
+
+
+def index_paths_from_env(variable: str = "RAG_INDEX_PATHS") -> List[str]:
+    """Пути к индексам из переменной окружения"""
+    value = os.getenv(variable, "")
+    return [p.strip() for p in value.split(os.pathsep) if p.strip()]
+
+
+def overlap_length(left: str, right: str, max_overlap: int = MAX_OVERLAP,
+                   min_overlap: int = MIN_OVERLAP) -> int:
+    """Длина самого длинного конца left, с которого начинается right (0 - нет перекрытия)"""
+    for n in range(min(max_overlap, len(left), len(right)), min_overlap - 1, -1):
+        if left.endswith(right[:n]):
+            return n
+    return 0
+
+
+def join_chunks(texts: List[str]) -> str:
+    """Склеивает подряд идущие чанки, убирая повторённое перекрытие"""
+    merged = texts[0]
+    for text in texts[1:]:
+        n = overlap_length(merged, text)
+        merged = merged + text[n:] if n else f"{merged} {text}"
+    return merged
+
+
+class ChunkMerger:
+    """Склейка найденных соседних чанков одного документа после поиска"""
+
+    def __init__(self, chunks: List[Dict], text_key: str = "text"):
+        """
+        Args:
+            chunks: все чанки базы (с полями index, doc_id, chunk_id)
+            text_key: поле с текстом чанка ("text" в индексе, "content" в базе знаний)
+        """
+        self.text_key = text_key
+        self._chunks = {
+            (chunk.get("index"), chunk["doc_id"], chunk["chunk_id"]): chunk
+            for chunk in chunks
+        }
+
+    def _neighbour(self, document: Tuple, chunk_id: int) -> Optional[Dict]:
+        return self._chunks.get(document + (chunk_id,))
+
+    def _expand(self, selected: Dict[Tuple, Dict[int, Dict]],
+                hits: List[Tuple[Tuple, int]], budget: int):
+        """Добавляет соседей к лучшим попаданиям, пока хватает бюджета токенов"""
+        added = True
+        while added and budget > 0:
+            added = False
+            for document, chunk_id in hits:
+                chunks = selected[document]
+                # Границы куска, в который уже входит попадание
+                first = last = chunk_id
+                while first - 1 in chunks:
+                    first -= 1
+                while last + 1 in chunks:
+                    last += 1
+
+                for candidate in (last + 1, first - 1):
+                    neighbour = self._neighbour(document, candidate)
+                    if neighbour is None:
+                        continue
+                    tokens = estimate_tokens(neighbour[self.text_key])
+                    if tokens <= budget:
+                        chunks[candidate] = neighbour
+                        budget -= tokens
+                        added = True
+                        break
+
+    def merge(self, hits: List[Tuple[Dict, float]],
+              expand_tokens: int = 0) -> List[Tuple[Dict, float]]:
+        """
+        Объединяет попадания с одинаковым doc_id и соседними chunk_id
+
+        Args:
+            hits: результаты поиска [(чанк, сходство)] по убыванию сходства
+            expand_tokens: сколько токенов можно добавить соседними чанками
+
+        Returns:
+            [(фрагмент, лучшее сходство)] - копия первого чанка с общим текстом
+            и списком "chunk_ids", по убыванию сходства
+        """
+        selected: Dict[Tuple, Dict[int, Dict]] = {}
+        scores: Dict[Tuple, float] = {}
+        order = []
+        for chunk, score in hits:
+            document = (chunk.get("index"), chunk["doc_id"])
+            selected.setdefault(document, {})[chunk["chunk_id"]] = chunk
+            scores[document + (chunk["chunk_id"],)] = score
+            order.append((document, chunk["chunk_id"]))
+
+        if expand_tokens:
+            self._expand(selected, order, expand_tokens)
+
+        spans = []
+        for document, chunks in selected.items():
+            run = []
+            for chunk_id in sorted(chunks) + [None]:
+                if run and (chunk_id is None or chunk_id != run[-1] + 1):
+                    span = dict(chunks[run[0]])
+                    span[self.text_key] = join_chunks([chunks[i][self.text_key] for i in run])
+                    span["chunk_ids"] = run
+                    best = max(scores[document + (i,)] for i in run if document + (i,) in scores)
+                    spans.append((span, best))
+                    run = []
+                if chunk_id is not None:
+                    run.append(chunk_id)
+
+        spans.sort(key=lambda item: item[1], reverse=True)
+        return spans
+
+
+class PrebuiltIndex:
+    """Один индекс, построенный index_real_documents.py"""
+
+    def __init__(self, path: str):
+        self.path = path
+        parent = Path(path).parent.name
+        self.name = f"{parent}/{Path(path).stem}" if parent else Path(path).stem
+
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        self.config = data["config"]
+        self.model_name = self.config["model"]
+        self.documents = data.get("documents", [])
+
+        # Имя индекса в чанке: doc_id уникален только внутри своего индекса
+        self.chunks = [dict(chunk, index=self.name) for chunk in data["chunks"]]
+
+        embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+        if embeddings.shape != (len(self.chunks), self.config["embedding_dim"]):
+            raise ValueError(
+                f"Индекс {path} повреждён: {embeddings.shape} эмбеддингов "
+                f"на {len(self.chunks)} чанков размерности {self.config['embedding_dim']}"
+            )
+        self.embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+class MountedIndexes:
+    """Несколько индексов как одна база знаний агента"""
+
+    def __init__(self, paths: List[str]):
+        if not paths:
+            raise ValueError("Не указано ни одного индекса")
+
+        self.indexes = [PrebuiltIndex(path) for path in paths]
+
+        # Все индексы должны быть построены одной моделью: запрос кодируется один раз
+        model_names = {index.model_name for index in self.indexes}
+        if len(model_names) > 1:
+            details = ", ".join(f"{index.path}: {index.model_name}" for index in self.indexes)
+            raise ValueError(f"Индексы построены разными моделями ({details})")
+
+        self.model_name = model_names.pop()
+        self.model = get_model(self.model_name)
+
+        self.chunks = [chunk for index in self.indexes for chunk in index.chunks]
+        self.texts = [chunk["text"] for chunk in self.chunks]
+        self.embeddings = np.vstack([index.embeddings for index in self.indexes])
+        self.merger = ChunkMerger(self.chunks)
+
+        print(f"📚 Подключено индексов: {len(self.indexes)}, чанков: {len(self.chunks)} "
+              f"(модель {self.model_name})")
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """Нормализованный эмбеддинг запроса моделью индекса"""
+        query_embedding = self.model.encode(query)
+        return query_embedding / np.linalg.norm(query_embedding)
+
+    def search(self, query: str, top_k: int = 3) -> List[Tuple[Dict, float]]:
+        """Топ-K чанков по косинусному сходству (запрос кодируется моделью индекса)"""
+        query_embedding = self.encode_query(query)
+        similarities = self.embeddings @ query_embedding
+
+        top_k = min(top_k, len(similarities))
+        top_indices = np.argpartition(similarities, -top_k)[-top_k:]
+        top_indices = top_indices[np.argsort(similarities[top_indices])[::-1]]
+
+        return [(self.chunks[i], float(similarities[i])) for i in top_indices]
+
+    def search_merged(self, query: str, top_k: int = 3,
+                      expand_tokens: int = 0) -> List[Tuple[Dict, float]]:
+        """Топ-K чанков, соседние склеены в один фрагмент (см. ChunkMerger.merge)"""
+        hits = self.search(query, top_k)
+        return self.merger.merge(hits, expand_tokens)
+
+    def as_documents(self) -> List[Dict]:
+        """Чанки в формате базы знаний RAGChatBot"""
+        return [
+            {
+                "id": f"{chunk['index']}/{chunk['filename']}#{chunk['chunk_id']}",
+                "title": f"{chunk['filename']} (фрагмент {chunk['chunk_id'] + 1})",
+                "content": chunk["text"],
+                "category": chunk["index"],
+                "date": "",
+                "filename": chunk["filename"],
+                "doc_id": chunk["doc_id"],
+                "chunk_id": chunk["chunk_id"],
+                "index": chunk["index"],
+            }
+            for chunk in self.chunks
+        ]
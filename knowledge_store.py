@@ -0,0 +1,237 @@
+"""
+Внешняя база знаний с сохранёнными эмбеддингами
+Документы читаются из JSON-файла или папки, эмбеддинги хранятся рядом
+и проверяются по хэшу содержимого - при старте кодируется только новое.
+Горячая перезагрузка пересчитывает эмбеддинги лишь для добавленных
+и изменённых документов, пока бот продолжает отвечать.
+
+Форматы источника:
+    kb.json               - список документов {"id", "title", "content", "category", "date"}
+    папка/                - *.json (документ или список) и *.txt / *.md (документ = файл)
+
+Эмбеддинги:
+    kb.json.embeddings.npz  или  папка/.embeddings.npz
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+TEXT_EXTENSIONS = [".txt", ".md"]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class KnowledgeSnapshot:
+    """Неизменяемый срез базы: документы и их нормализованные эмбеддинги"""
+
+    def __init__(self, documents: List[Dict], embeddings: np.ndarray, hashes: List[str] = None):
+        self.documents = documents
+        self.texts = [doc["content"] for doc in documents]
+        self.hashes = hashes if hashes is not None else [content_hash(t) for t in self.texts]
+        self.embeddings = embeddings
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True) if len(embeddings) else 1
+        self.normalized = embeddings / norms
+
+
+class KnowledgeStore:
+    """База знаний с кэшем эмбеддингов и горячей перезагрузкой"""
+
+    def __init__(self, model, model_name: str, source: str = None,
+                 default_documents: List[Dict] = None,
+                 preloaded: KnowledgeSnapshot = None):
+        """
+        Args:
+            model: модель эмбеддингов (encode)
+            model_name: имя модели - при смене модели кэш не используется
+            source: путь к JSON-файлу или папке (None - default_documents)
+            default_documents: документы, если внешний источник не задан
+            preloaded: готовый срез с эмбеддингами (например, индекс Agent 16)
+        """
+        self.model = model
+        self.model_name = model_name
+        self.source = source
+        self.default_documents = default_documents or []
+
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._source_mtime = None
+
+        if preloaded is not None:
+            # Эмбеддинги уже посчитаны - ничего не кодируем
+            self.default_documents = preloaded.documents
+            self.snapshot = preloaded
+            return
+
+        self.snapshot = KnowledgeSnapshot([], np.zeros((0, 0), dtype=np.float32))
+        self.reload()
+
+    @property
+    def cache_path(self) -> Optional[str]:
+        if not self.source:
+            return None
+        if os.path.isdir(self.source):
+            return os.path.join(self.source, ".embeddings.npz")
+        return self.source + ".embeddings.npz"
+
+    def _read_documents(self) -> List[Dict]:
+        """Читает документы из источника"""
+        if not self.source:
+            return list(self.default_documents)
+
+        path = Path(self.source)
+        if path.is_file():
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        documents = []
+        for file_path in sorted(path.rglob("*")):
+            if not file_path.is_file() or file_path.name.startswith("."):
+                continue
+
+            relative = file_path.relative_to(path).as_posix()
+            suffix = file_path.suffix.lower()
+
+            if suffix == ".json":
+                with open(file_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                documents.extend(data if isinstance(data, list) else [data])
+
+            elif suffix in TEXT_EXTENSIONS:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    content = f.read().strip()
+                documents.append({
+                    "id": relative,
+                    "title": file_path.stem,
+                    "content": content,
+                    "category": file_path.parent.name if file_path.parent != path else "документы",
+                    "date": datetime.fromtimestamp(file_path.stat().st_mtime).strftime("%Y-%m-%d")
+                })
+
+        return documents
+
+    def _load_cache(self) -> Dict[str, np.ndarray]:
+        """hash -> эмбеддинг из файла рядом с данными"""
+        cache_path = self.cache_path
+        if not cache_path or not os.path.exists(cache_path):
+            return {}
+
+        try:
+            data = np.load(cache_path)
+            if str(data["model"]) != self.model_name:
+                print(f"⚠️  Кэш эмбеддингов построен другой моделью ({data['model']}) - пересчитываем")
+                return {}
+            return dict(zip(data["hashes"].tolist(), data["embeddings"]))
+        except Exception as e:
+            print(f"⚠️  Не удалось прочитать кэш эмбеддингов {cache_path}: {e}")
+            return {}
+
+    def _save_cache(self, hashes: List[str], embeddings: np.ndarray):
+        """Атомарно сохраняет кэш эмбеддингов"""
+        cache_path = self.cache_path
+        if not cache_path:
+            return
+
+        tmp_path = cache_path + ".tmp.npz"
+        np.savez(tmp_path, model=np.array(self.model_name),
+                 hashes=np.array(hashes), embeddings=embeddings)
+        os.replace(tmp_path, cache_path)
+
+    def _current_mtime(self) -> Optional[float]:
+        if not self.source or not os.path.exists(self.source):
+            return None
+        path = Path(self.source)
+        if path.is_file():
+            return path.stat().st_mtime
+        # Папка: самое позднее изменение среди файлов (и самой папки - на случай удалений)
+        mtimes = [p.stat().st_mtime for p in path.rglob("*")
+                  if p.is_file() and not p.name.startswith(".")]
+        return max(mtimes + [path.stat().st_mtime])
+
+    def reload(self) -> Dict:
+        """
+        Перечитывает источник и кодирует только новые/изменённые документы
+
+        Returns:
+            {"documents", "encoded", "reused", "removed"}
+        """
+        with self._lock:
+            mtime = self._current_mtime()
+            documents = self._read_documents()
+            hashes = [content_hash(doc["content"]) for doc in documents]
+
+            # Эмбеддинги из памяти (перезагрузка) и с диска (старт)
+            known = dict(zip(self.snapshot.hashes, self.snapshot.embeddings))
+            if not known:
+                known = self._load_cache()
+
+            missing = sorted({h for h in hashes if h not in known})
+            missing_set = set(missing)
+            if missing:
+                texts_by_hash = {h: doc["content"] for h, doc in zip(hashes, documents)}
+                print(f"📝 Кодируем {len(missing)} новых/изменённых документов...")
+                new_embeddings = self.model.encode([texts_by_hash[h] for h in missing])
+                known.update(zip(missing, new_embeddings))
+
+            if documents:
+                embeddings = np.stack([known[h] for h in hashes]).astype(np.float32)
+            else:
+                embeddings = np.zeros((0, 0), dtype=np.float32)
+
+            removed = len(set(self.snapshot.hashes) - set(hashes))
+
+            if missing or removed or (self.cache_path and not os.path.exists(self.cache_path)):
+                unique = list(dict.fromkeys(hashes))
+                if unique:
+                    self._save_cache(unique, np.stack([known[h] for h in unique]).astype(np.float32))
+
+            # Атомарная подмена: поиск всегда видит согласованный срез
+            self.snapshot = KnowledgeSnapshot(documents, embeddings, hashes)
+            self._source_mtime = mtime
+
+            return {
+                "documents": len(documents),
+                "encoded": len(missing),
+                "reused": sum(1 for h in hashes if h not in missing_set),
+                "removed": removed
+            }
+
+    def reload_if_changed(self) -> Optional[Dict]:
+        """Перезагрузка, только если источник изменился"""
+        if self.source and self._current_mtime() != self._source_mtime:
+            return self.reload()
+        return None
+
+    def start_watching(self, interval: float = 30):
+        """Фоновая проверка источника на изменения"""
+        if self._watcher is not None or not self.source:
+            return
+
+        stop = threading.Event()
+
+        def watch():
+            while not stop.wait(interval):
+                try:
+                    result = self.reload_if_changed()
+                    if result:
+                        print(f"🔄 База знаний обновлена: {result}")
+                except Exception as e:
+                    print(f"⚠️  Ошибка перезагрузки базы знаний: {e}")
+
+        self._stop_watching = stop
+        self._watcher = threading.Thread(target=watch, name="knowledge-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._stop_watching.set()
+            self._watcher.join()
+            self._watcher = None
@@ -0,0 +1,218 @@
+"""
+ОЦЕНКА КАЧЕСТВА И СКОРОСТИ ПОИСКА (RAG)
+Прогоняет размеченные вопросы через все ретриверы репозитория
+и считает recall@k, MRR и задержку p50/p95. Claude не вызывается.
+
+Формат файла разметки (JSON-список):
+    {"question": "...", "corpus": "neurotech" | "agent16", "relevant": ["фрагмент", ...]}
+Найденный текст считается релевантным, если содержит хотя бы один фрагмент.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+# Поиск не обращается к Claude, но модули агентов проверяют ключ при импорте
+os.environ.setdefault("ANTHROPIC_API_KEY", "retrieval-eval-no-llm")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_LABELS = os.path.join(BASE_DIR, "retrieval_labels.json")
+AGENT16_INDEX = os.path.join(BASE_DIR, "Agent 16", "document_index.json")
+
+ALL_RETRIEVERS = ["chroma", "simple", "day18_filter", "day19_kb", "agent16"]
+
+
+class Retriever:
+    """Обёртка над поиском одного агента"""
+
+    def __init__(self, name: str, corpus: str, texts: List[str],
+                 search: Callable[[str, int], List[str]]):
+        self.name = name
+        self.corpus = corpus
+        self.texts = texts
+        self.search = search
+
+
+def _quiet(func: Callable, *args, **kwargs):
+    """Вызов без вывода в консоль (агенты много печатают при поиске)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def build_retrievers(names: List[str], threshold: float = 0.5) -> List[Retriever]:
+    """Создаёт ретриверы по именам"""
+    retrievers = []
+
+    if "chroma" in names or "simple" in names:
+        from day17_agent import ClaudeRAGAgent
+
+        print("🔄 day17: ClaudeRAGAgent...")
+        agent = _quiet(ClaudeRAGAgent)
+
+        if "chroma" in names:
+            if agent.collection is not None:
+                chunks = agent.collection.get()["documents"]
+                retrievers.append(Retriever(
+                    "chroma", "neurotech", chunks,
+                    lambda q, k: agent.search_relevant_chunks(q, k)
+                ))
+            else:
+                print("⚠️  ChromaDB недоступна - ретривер 'chroma' пропущен")
+
+        if "simple" in names:
+            if not hasattr(agent, "documents_index"):
+                agent.documents_index = _quiet(agent._create_simple_index, agent.sample_documents)
+            retrievers.append(Retriever(
+                "simple", "neurotech", agent.sample_documents,
+                lambda q, k: agent._simple_search(q, k)
+            ))
+
+    if "day18_filter" in names:
+        from day18_agent import SimpleRAG
+
+        print("🔄 day18: SimpleRAG...")
+        rag = _quiet(SimpleRAG)
+        retrievers.append(Retriever(
+            "day18_filter", "neurotech", rag.documents,
+            lambda q, k: [doc for doc, _, _ in rag.search_with_filter(q, threshold=threshold, top_k=k)]
+        ))
+
+    if "day19_kb" in names:
+        from day19_agent import RAGChatBot
+
+        print("🔄 day19: RAGChatBot...")
+        bot = _quiet(RAGChatBot)
+        retrievers.append(Retriever(
+            "day19_kb", "neurotech", bot.knowledge_texts,
+            lambda q, k: [doc["content"] for doc in bot._search_in_knowledge_base(q, top_k=k)]
+        ))
+
+    if "agent16" in names:
+        print("🔄 Agent 16: document_index.json...")
+        retrievers.append(_build_agent16_retriever(AGENT16_INDEX))
+
+    return retrievers
+
+
+def _build_agent16_retriever(index_path: str) -> Retriever:
+    """Поиск по индексу Agent 16 той же моделью, что строила индекс"""
+    from index_loader import MountedIndexes
+
+    mounted = _quiet(MountedIndexes, [index_path])
+
+    return Retriever(
+        "agent16", "agent16", mounted.texts,
+        lambda q, k: [chunk["text"] for chunk, _ in mounted.search(q, k)]
+    )
+
+
+def load_labels(path: str) -> List[Dict]:
+    """Загружает размеченные вопросы"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _is_relevant(text: str, fragments: List[str]) -> bool:
+    return any(fragment in text for fragment in fragments)
+
+
+def evaluate_retriever(retriever: Retriever, labels: List[Dict], k: int = 3) -> Dict:
+    """Считает recall@k, MRR и задержку для одного ретривера"""
+    recalls = []
+    reciprocal_ranks = []
+    latencies = []
+    skipped = 0
+
+    questions = [item for item in labels if item["corpus"] == retriever.corpus]
+
+    # Прогрев: первый вызов модели заметно медленнее остальных
+    if questions:
+        _quiet(retriever.search, questions[0]["question"], k)
+
+    for item in questions:
+        # Фрагменты, которых нет в корпусе этого ретривера, не оцениваем
+        fragments = [f for f in item["relevant"]
+                     if any(f in text for text in retriever.texts)]
+        if not fragments:
+            skipped += 1
+            continue
+
+        start = time.perf_counter()
+        results = _quiet(retriever.search, item["question"], k)
+        latencies.append(time.perf_counter() - start)
+
+        results = results[:k]
+        found = {f for f in fragments for text in results if f in text}
+        recalls.append(len(found) / len(fragments))
+
+        rank = next((i for i, text in enumerate(results, 1)
+                     if _is_relevant(text, fragments)), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+
+    if not latencies:
+        return {"retriever": retriever.name, "questions": 0, "skipped": skipped}
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "retriever": retriever.name,
+        "questions": len(latencies),
+        "skipped": skipped,
+        f"recall@{k}": float(np.mean(recalls)),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "latency_p95_ms": float(np.percentile(latencies_ms, 95)),
+    }
+
+
+def print_report(results: List[Dict], k: int):
+    """Печатает таблицу результатов"""
+    print("\n" + "=" * 80)
+    print(f"📊 КАЧЕСТВО ПОИСКА (k={k})")
+    print("=" * 80)
+    print(f"{'Ретривер':<15} {'Вопросов':<10} {f'Recall@{k}':<11} {'MRR':<8} {'p50, мс':<10} {'p95, мс':<10}")
+    print("-" * 80)
+
+    for r in results:
+        if not r["questions"]:
+            print(f"{r['retriever']:<15} {'нет вопросов':<10}")
+            continue
+        print(f"{r['retriever']:<15} {r['questions']:<10} {r[f'recall@{k}']:<11.3f} "
+              f"{r['mrr']:<8.3f} {r['latency_p50_ms']:<10.2f} {r['latency_p95_ms']:<10.2f}")
+
+    print("=" * 80)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Оценка качества поиска RAG-агентов")
+    parser.add_argument("--labels", default=DEFAULT_LABELS, help="Файл с размеченными вопросами")
+    parser.add_argument("--k", type=int, default=3, help="Сколько результатов оценивать")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Порог для day18 search_with_filter")
+    parser.add_argument("--retrievers", default=",".join(ALL_RETRIEVERS),
+                        help=f"Через запятую: {', '.join(ALL_RETRIEVERS)}")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    labels = load_labels(args.labels)
+    print(f"📋 Загружено {len(labels)} размеченных вопросов")
+
+    names = [name.strip() for name in args.retrievers.split(",") if name.strip()]
+    retrievers = build_retrievers(names, threshold=args.threshold)
+
+    results = [evaluate_retriever(r, labels, k=args.k) for r in retrievers]
+    print_report(results, args.k)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"k": args.k, "threshold": args.threshold, "results": results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"💾 Результаты сохранены: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Журнал сессий чат-бота
+Каждый ход диалога дописывается одной строкой JSONL (O(1) на ход),
+fsync выполняется пачками. Компакция сворачивает журнал в снимок.
+
+Файлы сессии:
+    sessions/<id>.jsonl          - журнал ходов (только дописывание)
+    sessions/<id>.snapshot.json  - снимок после последней компакции
+"""
+
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+class SessionJournal:
+    """Журнал одной сессии диалога"""
+
+    def __init__(self, session_id: str = None, directory: str = "sessions",
+                 fsync_every: int = 5, compact_every: int = 200):
+        """
+        Args:
+            session_id: ID сессии (None - новая сессия)
+            directory: папка с журналами
+            fsync_every: fsync после каждых N записей (при сбое теряется не больше пачки)
+            compact_every: автоматическая компакция после N записей в журнале
+        """
+        # Время - для сортировки в /sessions, uuid4 - уникальность при одновременном создании
+        self.session_id = session_id or f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex}"
+        self.directory = directory
+        self.fsync_every = fsync_every
+        self.compact_every = compact_every
+
+        self.journal_path = os.path.join(directory, f"{self.session_id}.jsonl")
+        self.snapshot_path = os.path.join(directory, f"{self.session_id}.snapshot.json")
+
+        self._file = None
+        self._unsynced = 0
+        self._seq = 0
+        self._journal_records = 0
+
+    @staticmethod
+    def list_sessions(directory: str = "sessions") -> List[str]:
+        """ID всех сохранённых сессий"""
+        if not os.path.isdir(directory):
+            return []
+        ids = set()
+        for name in os.listdir(directory):
+            if name.endswith(".snapshot.json"):
+                ids.add(name[:-len(".snapshot.json")])
+            elif name.endswith(".jsonl"):
+                ids.add(name[:-len(".jsonl")])
+        return sorted(ids)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.journal_path) or os.path.exists(self.snapshot_path)
+
+    def load(self) -> Tuple[List[Dict], Optional[Dict]]:
+        """
+        Восстанавливает сессию: снимок + ходы из журнала после него
+
+        Returns:
+            (история диалога, последняя статистика или None)
+        """
+        history = []
+        stats = None
+        snapshot_seq = 0
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            history = snapshot["history"]
+            stats = snapshot.get("stats")
+            snapshot_seq = snapshot["seq"]
+
+        self._seq = snapshot_seq
+        self._journal_records = 0
+
+        if os.path.exists(self.journal_path):
+            offset = 0
+            good_offset = 0  # конец последней целой записи
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    offset += len(line)
+                    try:
+                        record = json.loads(line.decode("utf-8"))
+                    except (UnicodeDecodeError, json.JSONDecodeError):
+                        # Оборванная строка после сбоя - пропускаем
+                        continue
+
+                    good_offset = offset
+
+                    self._journal_records += 1
+
+                    # Записи, уже свёрнутые в снимок (сбой во время компакции)
+                    if record["seq"] <= snapshot_seq:
+                        continue
+
+                    if record["type"] == "turn":
+                        history.extend(record["messages"])
+                    elif record["type"] == "clear":
+                        history = []
+
+                    if "stats" in record:
+                        stats = record["stats"]
+                    self._seq = record["seq"]
+
+            if good_offset < offset or (offset and not line.endswith(b"\n")):
+                # Следующая запись не должна дописаться к обрывку
+                self._repair(good_offset)
+
+        return history, stats
+
+    def _repair(self, good_offset: int):
+        """Обрезает журнал до последней целой записи и завершает её переводом строки"""
+        with open(self.journal_path, "r+b") as f:
+            f.truncate(good_offset)
+            if good_offset:
+                f.seek(good_offset - 1)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+
+    def _append(self, record: Dict):
+        self._open()
+        self._seq += 1
+        record["seq"] = self._seq
+
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+        self._journal_records += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def append_turn(self, messages: List[Dict], stats: Dict):
+        """Дописывает один ход диалога (вопрос и ответ)"""
+        self._append({"type": "turn", "messages": messages, "stats": stats})
+
+    def append_clear(self, stats: Dict):
+        """Отмечает очистку истории"""
+        self._append({"type": "clear", "stats": stats})
+
+    def needs_compaction(self) -> bool:
+        return self._journal_records >= self.compact_every
+
+    def compact(self, history: List[Dict], stats: Dict):
+        """
+        Сворачивает журнал в снимок
+
+        Снимок пишется во временный файл и атомарно подменяется,
+        после этого журнал начинается заново.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self.sync()
+
+        snapshot = {
+            "session_id": self.session_id,
+            "seq": self._seq,
+            "history": history,
+            "stats": stats,
+            "timestamp": datetime.now().isoformat()
+        }
+
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        # Если упадём здесь, при загрузке записи с seq <= snapshot.seq будут пропущены
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        open(self.journal_path, "w", encoding="utf-8").close()
+        self._journal_records = 0
+
+    def sync(self):
+        """Сбрасывает журнал на диск"""
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        self.sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,46 @@
+"""
+Оценка токенов и обрезка истории по бюджету
+Без токенизатора: для смешанного русского/английского текста
+Claude в среднем тратит ~1 токен на 3 символа.
+"""
+
+from typing import Dict, List
+
+CHARS_PER_TOKEN = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Приблизительное число токенов в тексте"""
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def trim_messages_to_budget(messages: List[Dict], max_tokens: int) -> List[Dict]:
+    """
+    Оставляет самые свежие сообщения, которые помещаются в бюджет
+
+    Args:
+        messages: сообщения в формате Claude API ({"role", "content"})
+        max_tokens: бюджет на историю
+
+    Returns:
+        Хвост списка; первое сообщение всегда от пользователя
+    """
+    kept = []
+    used = 0
+
+    for message in reversed(messages):
+        tokens = estimate_tokens(message["content"])
+        if used + tokens > max_tokens:
+            break
+        kept.append(message)
+        used += tokens
+
+    kept.reverse()
+
+    # Claude API требует, чтобы диалог начинался с сообщения пользователя
+    while kept and kept[0]["role"] != "user":
+        kept.pop(0)
+
+    return kept
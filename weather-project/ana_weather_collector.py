@@ -1,15 +1,75 @@
 """
 Ana Weather - Сборщик погоды
-Каждые 2 минут собирает погоду и сохраняет в JSON
+Каждые 2 минут собирает погоду и сохраняет в SQLite (weather_history.db)
+
+По умолчанию инструменты вызываются напрямую (без Claude): все города
+одним проходом, прогноз запрашивается пачками координат.
+Старый режим через Claude:  python ana_weather_collector.py --llm
+                        или  WEATHER_COLLECTOR_LLM=1 в .env
+Сбор и summary в одном процессе: python ana_weather_daemon.py
+
+Города (по умолчанию Warsaw) задаются в .env:
+    WEATHER_CITIES=Warsaw,Krakow,Berlin
+    WEATHER_CITIES_FILE=cities.txt      # по городу в строке
 """
 
+import os
+import sys
 import time
 from datetime import datetime
-from day13_weather_mcp import create_agent
+from typing import Callable, List
+from day13_weather_mcp import WeatherTool, create_agent
+from scheduler import Scheduler
+from weather_history_tool import WeatherHistoryTool
+
+INTERVAL_MINUTES = 2
+
+
+def load_cities() -> List[str]:
+    """Список городов из .env (файл или через запятую)"""
+    cities_file = os.getenv("WEATHER_CITIES_FILE")
+    if cities_file:
+        with open(cities_file, "r", encoding="utf-8") as f:
+            cities = [line.strip() for line in f]
+    else:
+        cities = os.getenv("WEATHER_CITIES", "Warsaw").split(",")
+    return [c.strip() for c in cities if c.strip() and not c.strip().startswith("#")]
+
+
+def collect_weather_direct(weather_tool: WeatherTool, history_tool: WeatherHistoryTool,
+                           cities: List[str]) -> int:
+    """Собирает погоду для всех городов и сохраняет в базу без LLM"""
+    
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Сбор погоды ({len(cities)} городов)...")
+    start = time.perf_counter()
+    
+    results = weather_tool.get_weather_batch(cities)
+    
+    records = {}
+    for city, data in results.items():
+        if "error" in data:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Ошибка ({city}): {data['error']}")
+            continue
+        # "Warsaw" и "Варшава" в списке - один город, одна запись
+        records[data["city"]] = data
+    records = list(records.values())
+    
+    if records:
+        history_tool.add_weather_records(records)
+    
+    if len(records) == 1:
+        data = records[0]
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Сохранено в базу: "
+              f"{data['city']} {data['temperature']}°C, {data['description']} "
+              f"({time.perf_counter() - start:.2f} с)")
+    else:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Сохранено в базу: "
+              f"{len(records)}/{len(cities)} городов ({time.perf_counter() - start:.2f} с)")
+    return len(records)
 
 
 def collect_weather(agent, city: str = "Warsaw"):
-    """Собирает погоду и сохраняет в JSON через MCP"""
+    """Собирает погоду и сохраняет в базу через MCP (Claude сам вызывает инструменты)"""
     
     print(f"[{datetime.now().strftime('%H:%M:%S')}] Сбор погоды...")
     
@@ -22,12 +82,53 @@ def collect_weather(agent, city: str = "Warsaw"):
             silent=True
         )
         
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Сохранено в JSON")
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Сохранено в базу")
         
     except Exception as e:
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Ошибка: {e}")
 
 
+def use_llm() -> bool:
+    """Режим сбора через Claude (--llm или WEATHER_COLLECTOR_LLM=1)"""
+    return "--llm" in sys.argv or os.getenv("WEATHER_COLLECTOR_LLM") == "1"
+
+
+def make_collect_job(cities: List[str], llm: bool = False, weather_tool: WeatherTool = None,
+                     history_tool: WeatherHistoryTool = None) -> Callable[[], None]:
+    """
+    Задача сбора для планировщика
+    
+    Args:
+        llm: собирать через Claude + MCP
+        weather_tool, history_tool: общие с другими задачами инструменты (кэши)
+    
+    Returns:
+        Функция без аргументов или None, если агента создать не удалось
+    """
+    if llm:
+        # Каждый сбор независим: без накопления истории. Инструменты общие -
+        # Claude пишет в то же хранилище, из которого читает summary
+        agent = create_agent(history_mode="stateless", weather_tool=weather_tool,
+                             history_tool=history_tool)
+        if not agent:
+            return None
+        
+        def collect():
+            for city in cities:
+                collect_weather(agent, city)
+    else:
+        weather_tool = weather_tool or WeatherTool()
+        history_tool = history_tool or WeatherHistoryTool()
+        
+        def collect():
+            start = time.perf_counter()
+            collect_weather_direct(weather_tool, history_tool, cities)
+            if time.perf_counter() - start > INTERVAL_MINUTES * 60 / 2:
+                print("⚠️  Сбор занял больше половины интервала - уменьшите список городов")
+    
+    return collect
+
+
 def main():
     """Главная функция сборщика"""
     
@@ -35,38 +136,30 @@ def main():
     print("Ana Weather - Сборщик")
     print("="*60)
     
-    agent = create_agent()
-    if not agent:
+    CITIES = load_cities()
+    USE_LLM = use_llm()
+    
+    collect = make_collect_job(CITIES, USE_LLM)
+    if collect is None:
         print("Ошибка: не удалось создать агента")
         return
     
-    CITY = "Warsaw"
-    INTERVAL_MINUTES = 2
-    
-    print(f"Город: {CITY}")
+    print(f"Города: {', '.join(CITIES[:10])}" + (f" и ещё {len(CITIES) - 10}" if len(CITIES) > 10 else ""))
     print(f"Интервал: {INTERVAL_MINUTES} минут")
-    print("Сохраняет в: weather_history.json")
+    print(f"Режим: {'Claude + MCP' if USE_LLM else 'прямой вызов инструментов'}")
+    print("Сохраняет в: weather_history.db")
     print("="*60 + "\n")
     
-    # Собираем сразу при запуске
-    collect_weather(agent, CITY)
-    
-    collection_count = 1
+    # Первый сбор сразу при запуске, дальше ровно по сетке интервала
+    scheduler = Scheduler()
+    scheduler.add_job("collector", collect, interval=INTERVAL_MINUTES * 60)
     
     try:
-        while True:
-            # Ждём интервал
-            for i in range(INTERVAL_MINUTES):
-                time.sleep(60)
-            
-            # Собираем погоду
-            collection_count += 1
-            print(f"\n[Сбор #{collection_count}]")
-            collect_weather(agent, CITY)
-    
+        scheduler.run_forever()
     except KeyboardInterrupt:
+        metrics = scheduler.metrics()["collector"]
         print(f"\n\nСборщик остановлен")
-        print(f"Всего записей собрано: {collection_count}\n")
+        print(f"Всего сборов: {metrics['runs']} (пропущено: {metrics['missed'] + metrics['overlaps']})\n")
 
 
 if __name__ == "__main__":
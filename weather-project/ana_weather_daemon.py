@@ -0,0 +1,87 @@
+"""
+Ana Weather - сборщик и summary в одном процессе
+Задачи идут по общему планировщику (scheduler.py) и делят инструменты:
+один HTTP-пул, один геокодер, одно хранилище со статистикой в памяти.
+
+Запуск:
+    python ana_weather_daemon.py              # сбор без Claude, summary через Claude
+    python ana_weather_daemon.py --template   # summary по шаблону, без Claude
+    python ana_weather_daemon.py --llm        # сбор через Claude + MCP
+
+Города - как у сборщика (WEATHER_CITIES / WEATHER_CITIES_FILE),
+summary - по первому городу списка или WEATHER_SUMMARY_CITY.
+"""
+
+import json
+import os
+from datetime import datetime
+from ana_weather_collector import INTERVAL_MINUTES as COLLECT_MINUTES
+from ana_weather_collector import load_cities, make_collect_job, use_llm
+from ana_weather_summary import INTERVAL_MINUTES as SUMMARY_MINUTES
+from ana_weather_summary import SUMMARY_MODES, SummaryState, generate_summary, summary_mode
+from day13_weather_mcp import WeatherTool, create_agent
+from scheduler import Scheduler
+from telegram_queue import TelegramQueue
+from weather_history_tool import WeatherHistoryTool
+
+# Раз в час печатаем метрики задач
+METRICS_MINUTES = 60
+
+
+def main():
+    """Главная функция daemon"""
+
+    print("\n" + "="*60)
+    print("Ana Weather - Daemon (сбор + summary)")
+    print("="*60)
+
+    cities = load_cities()
+    city = os.getenv("WEATHER_SUMMARY_CITY", cities[0] if cities else "Warsaw")
+    mode = summary_mode()
+    if mode not in SUMMARY_MODES:
+        print(f"Ошибка: неизвестный режим {mode} ({', '.join(SUMMARY_MODES)})")
+        return
+
+    # Общие для всех задач инструменты
+    weather_tool = WeatherTool()
+    history_tool = WeatherHistoryTool()
+    notifier = TelegramQueue()
+
+    collect = make_collect_job(cities, use_llm(), weather_tool, history_tool)
+    agent = (create_agent(history_mode="stateless", weather_tool=weather_tool, history_tool=history_tool)
+             if mode == "llm" else None)
+    if collect is None or (mode == "llm" and agent is None):
+        print("Ошибка: не удалось создать агента")
+        return
+
+    state = SummaryState()
+    scheduler = Scheduler()
+
+    def report():
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Метрики задач:")
+        print(json.dumps({**scheduler.metrics(), "telegram_queue": notifier.metrics()},
+                         ensure_ascii=False, indent=2))
+
+    scheduler.add_job("collector", collect, interval=COLLECT_MINUTES * 60)
+    # Summary - после первого сбора; джиттер разводит его со сбором на общей сетке
+    scheduler.add_job("summary", lambda: generate_summary(agent, notifier, history_tool, state, city, mode),
+                      interval=SUMMARY_MINUTES * 60, jitter=5, delay=15)
+    scheduler.add_job("metrics", report, interval=METRICS_MINUTES * 60, delay=METRICS_MINUTES * 60)
+
+    print(f"Города: {', '.join(cities[:10])}" + (f" и ещё {len(cities) - 10}" if len(cities) > 10 else ""))
+    print(f"Сбор: каждые {COLLECT_MINUTES} минут")
+    print(f"Summary: {city}, каждые {SUMMARY_MINUTES} минут, режим {mode}")
+    print("="*60 + "\n")
+
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        print(f"\n\nDaemon остановлен")
+        left = notifier.close()
+        report()
+        if left:
+            print(f"Не отправлено сообщений: {left} (будут отправлены при следующем запуске)")
+
+
+if __name__ == "__main__":
+    main()
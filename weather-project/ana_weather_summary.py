@@ -1,32 +1,167 @@
 """
 Ana Weather - Summary
-Каждые 10 минут читает историю из JSON и отправляет summary в Telegram
+Каждые 10 минут читает историю и отправляет summary в Telegram
+
+Статистика считается напрямую (без вызова инструментов через Claude)
+и сравнивается со снимком прошлого summary: если новых записей нет или
+погода почти не изменилась, summary пропускается.
+Режимы (WEATHER_SUMMARY_MODE в .env или --template):
+    llm       - Claude пишет текст по готовой статистике, один запрос без инструментов
+    template  - текст по шаблону, без Claude
 """
 
+import json
+import os
+import sys
 import time
 from datetime import datetime
+from typing import Dict, Optional
 from day13_weather_mcp import create_agent
-from telegram_notifier import TelegramNotifier
+from scheduler import Scheduler
+from telegram_queue import TelegramQueue
+from weather_analytics import analyze
+from weather_history_tool import WeatherHistoryTool
+
+SUMMARY_MODES = ("llm", "template")
+INTERVAL_MINUTES = 10
+
+# Изменения, ради которых стоит отправлять новый summary
+CHANGE_THRESHOLDS = {"temperature": 0.5, "windspeed": 2.0}
+# Даже без изменений напоминаем о себе раз в REFRESH_HOURS часов
+REFRESH_HOURS = 6
+
+
+def collect_stats(history_tool: WeatherHistoryTool, city: str) -> Optional[Dict]:
+    """Статистика и тренды за сутки (счётчики в памяти + NumPy, без Claude)"""
+    summary = history_tool.store.aggregate(city)
+    if not summary:
+        return None
+    
+    now = time.time()
+    day = analyze(history_tool.store, city, now - 86400, now)
+    summary["trend_24h"] = {
+        metric: day[metric]["trend"] for metric in CHANGE_THRESHOLDS if metric in day
+    }
+    return summary
+
+
+def take_snapshot(stats: Dict) -> Dict:
+    """То, по чему сравниваются два summary"""
+    last_hour = stats["windows"]["last_hour"]
+    snapshot = {"count": stats["count"], "trend_24h": stats["trend_24h"]}
+    for metric in CHANGE_THRESHOLDS:
+        current = last_hour[metric] or stats[metric]
+        snapshot[metric] = {
+            "avg": current["avg"],
+            "min": stats[metric]["min"],
+            "max": stats[metric]["max"],
+        }
+    return snapshot
+
+
+def has_changed(previous: Optional[Dict], current: Dict) -> bool:
+    """Есть ли что сказать по сравнению с прошлым summary"""
+    if previous is None:
+        return True
+    if current["count"] == previous["count"]:
+        return False
+    if current["trend_24h"] != previous["trend_24h"]:
+        return True
+    for metric, threshold in CHANGE_THRESHOLDS.items():
+        before, after = previous[metric], current[metric]
+        # Новый рекорд за всё время или заметный сдвиг текущих значений
+        if after["min"] != before["min"] or after["max"] != before["max"]:
+            return True
+        if abs(after["avg"] - before["avg"]) >= threshold:
+            return True
+    return False
+
+
+def render_template(city: str, stats: Dict) -> str:
+    """Summary без Claude"""
+    lines = [f"{city}: {stats['period_start']} - {stats['period_end']}, записей: {stats['count']}"]
+    for metric, title, unit in (("temperature", "Температура", "°C"), ("windspeed", "Ветер", "км/ч")):
+        total = stats[metric]
+        line = (f"{title}: мин {total['min']}, макс {total['max']}, "
+                f"средняя {total['avg']} {unit}")
+        last_hour = stats["windows"]["last_hour"][metric]
+        if last_hour:
+            line += f", за час {last_hour['avg']} {unit}"
+        if metric in stats["trend_24h"]:
+            line += f", за сутки: {stats['trend_24h'][metric]}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def render_llm(agent, city: str, stats: Dict) -> str:
+    """Summary от Claude: статистика уже в запросе, инструменты не нужны"""
+    return agent.chat(
+        f"Статистика погоды в городе {city} (JSON):\n"
+        f"{json.dumps(stats, ensure_ascii=False, separators=(',', ':'))}\n\n"
+        f"Сделай краткое summary на русском языке: "
+        f"- за какой период данные, "
+        f"- как менялась температура (мин/макс/средняя), "
+        f"- как менялся ветер, "
+        f"- какие тренды. "
+        f"Отвечай кратко, максимум 5-6 строк.",
+        silent=True,
+        use_tools=False
+    )
 
 
-def generate_summary(agent, notifier: TelegramNotifier, city: str = "Warsaw"):
-    """Читает JSON и генерирует summary"""
+class SummaryState:
+    """Снимок статистики последнего отправленного summary"""
+    
+    def __init__(self):
+        self.snapshot = None
+        self.sent_at = None
+        self.sent = 0
+        self.skipped = 0
+    
+    def is_due(self, snapshot: Dict) -> bool:
+        if self.sent_at is not None and time.time() - self.sent_at >= REFRESH_HOURS * 3600:
+            return True
+        return has_changed(self.snapshot, snapshot)
+    
+    def mark_sent(self, snapshot: Dict):
+        self.snapshot = snapshot
+        self.sent_at = time.time()
+        self.sent += 1
+
+
+def generate_summary(agent, notifier: TelegramQueue, history_tool: WeatherHistoryTool,
+                     state: SummaryState, city: str = "Warsaw", mode: str = "llm") -> bool:
+    """
+    Считает статистику и отправляет summary, если что-то изменилось
+    
+    Args:
+        agent: агент Claude (нужен только в режиме llm)
+        state: снимок прошлого summary
+        mode: llm или template
+    
+    Returns:
+        True, если summary отправлен
+    """
     
     print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Генерация summary...")
     
     try:
-        # Просим Claude проанализировать историю из JSON
-        response = agent.chat(
-            f"Проанализируй историю погоды в городе {city}. "
-            f"Используй инструмент weather_history с action='stats' чтобы получить статистику. "
-            f"Сделай краткое summary на русском языке: "
-            f"- за какой период данные, "
-            f"- как менялась температура (мин/макс/средняя), "
-            f"- как менялся ветер, "
-            f"- какие тренды. "
-            f"Отвечай кратко, максимум 5-6 строк.",
-            silent=True
-        )
+        stats = collect_stats(history_tool, city)
+        if stats is None:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] История пуста - пропуск")
+            return False
+        
+        snapshot = take_snapshot(stats)
+        if not state.is_due(snapshot):
+            state.skipped += 1
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Без изменений - пропуск "
+                  f"(пропущено: {state.skipped})")
+            return False
+        
+        if mode == "template":
+            response = render_template(city, stats)
+        else:
+            response = render_llm(agent, city, stats)
         
         print(response)
         
@@ -41,12 +176,21 @@ def generate_summary(agent, notifier: TelegramNotifier, city: str = "Warsaw"):
 {response}
 """
         
+        # Только постановка в очередь: медленный Telegram не задерживает задачу
         notifier.send_message(telegram_message)
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Отправлено в Telegram")
+        state.mark_sent(snapshot)
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Поставлено в очередь Telegram")
+        return True
         
     except Exception as e:
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Ошибка: {e}")
         notifier.send_message(f"<b>Ana Weather - Ошибка</b>\n\n{e}")
+        return False
+
+
+def summary_mode() -> str:
+    """Режим summary: --template или WEATHER_SUMMARY_MODE (по умолчанию llm)"""
+    return "template" if "--template" in sys.argv else os.getenv("WEATHER_SUMMARY_MODE", "llm")
 
 
 def main():
@@ -56,22 +200,33 @@ def main():
     print("Ana Weather - Summary")
     print("="*60)
     
-    agent = create_agent()
-    if not agent:
-        print("Ошибка: не удалось создать агента")
+    MODE = summary_mode()
+    if MODE not in SUMMARY_MODES:
+        print(f"Ошибка: неизвестный режим {MODE} ({', '.join(SUMMARY_MODES)})")
         return
     
-    notifier = TelegramNotifier()
+    # Одно хранилище на процесс: агент (MCP-сервер) и summary читают одну базу
+    history_tool = WeatherHistoryTool()
+    
+    agent = None
+    if MODE == "llm":
+        # Каждый summary независим: без накопления истории
+        agent = create_agent(history_mode="stateless", history_tool=history_tool)
+        if not agent:
+            print("Ошибка: не удалось создать агента")
+            return
+    
+    notifier = TelegramQueue()
     if not notifier.enabled:
         print("Ошибка: Telegram не настроен")
         return
     
     CITY = "Warsaw"
-    INTERVAL_MINUTES = 10
     
     print(f"Город: {CITY}")
     print(f"Интервал: {INTERVAL_MINUTES} минут")
-    print(f"Читает из: weather_history.json")
+    print(f"Режим: {MODE}")
+    print(f"Читает из: weather_history.db")
     print("="*60 + "\n")
     
     # Приветственное сообщение
@@ -85,38 +240,31 @@ def main():
     
     notifier.send_message(welcome)
     
-    # Первый summary сразу
-    print("[Summary #1]")
-    generate_summary(agent, notifier, CITY)
+    state = SummaryState()
     
-    summary_count = 1
+    # Первый summary сразу, дальше ровно по сетке интервала
+    scheduler = Scheduler()
+    scheduler.add_job("summary", lambda: generate_summary(agent, notifier, history_tool, state, CITY, MODE),
+                      interval=INTERVAL_MINUTES * 60)
     
     try:
-        while True:
-            # Ждём интервал
-            for i in range(INTERVAL_MINUTES):
-                remaining = INTERVAL_MINUTES - i
-                if i % 10 == 0 and i > 0:
-                    print(f"[{datetime.now().strftime('%H:%M:%S')}] Следующий summary через {remaining} минут")
-                time.sleep(60)
-            
-            # Генерируем summary
-            summary_count += 1
-            print(f"\n[Summary #{summary_count}]")
-            generate_summary(agent, notifier, CITY)
-    
+        scheduler.run_forever()
     except KeyboardInterrupt:
         print(f"\n\nSummary Daemon остановлен")
-        print(f"Всего summary: {summary_count}\n")
+        print(f"Всего summary: {state.sent} (пропущено без изменений: {state.skipped})\n")
         
         goodbye = f"""
 <b>Ana Weather Summary остановлен</b>
 
-Всего summary: {summary_count}
+Всего summary: {state.sent}
+Пропущено без изменений: {state.skipped}
 Остановлен: {datetime.now().strftime('%H:%M, %d.%m.%Y')}
 """
         
         notifier.send_message(goodbye)
+        left = notifier.close()
+        if left:
+            print(f"Не отправлено сообщений: {left} (будут отправлены при следующем запуске)")
 
 
 if __name__ == "__main__":
@@ -4,43 +4,63 @@
 """
 
 import os
-import requests
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List
 from anthropic import Anthropic
 from dotenv import load_dotenv
+from geocoder import Geocoder
+from tool_runner import ToolRunner
 from weather_history_tool import WeatherHistoryTool
 
+# Общие модули (http_client) лежат в корне репозитория
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from http_client import HttpClient, get_default_client
+
 load_dotenv()
 
+# Режимы истории диалога агента:
+#   full      - вся история (интерактивный чат)
+#   window    - хвост истории в пределах бюджета токенов
+#   stateless - каждый вызов с чистого листа (daemon-ы)
+HISTORY_MODES = ("full", "window", "stateless")
+DEFAULT_HISTORY_TOKENS = 4000
+
+WEATHER_CODES = {
+    0: "ясно", 1: "малооблачно", 2: "облачно",
+    3: "пасмурно", 61: "дождь", 73: "снег", 95: "гроза"
+}
+
+# Open-Meteo пересчитывает current_weather раз в interval секунд (обычно 900):
+# ответ кэшируется до time + interval + UPDATE_GRACE
+UPDATE_GRACE = 60
+# Если новый расчёт запаздывает - спрашиваем не чаще раза в MIN_CACHE_TTL секунд
+MIN_CACHE_TTL = 60
+DEFAULT_UPDATE_INTERVAL = 900
+
 
 class WeatherTool:
     """Инструмент для получения текущей погоды"""
     
-    def __init__(self):
+    def __init__(self, geocoder: Geocoder = None, http: HttpClient = None):
         self.name = "get_weather"
         self.description = "Получает текущую погоду"
+        # Соединения с Open-Meteo переиспользуются, сбои сети повторяются
+        self.http = http or get_default_client()
+        self.forecast_url = "https://api.open-meteo.com/v1/forecast"
+        # Координаты берутся из кэша/справочника, API геокодирования - только для новых городов
+        self.geocoder = geocoder or Geocoder(http=self.http)
+        # Ответы по координатам - до следующего обновления модели Open-Meteo
+        self._cache: Dict[tuple, tuple] = {}  # (широта, долгота) -> (годен до, погода)
+        self._cache_lock = threading.Lock()
+        self.cache_stats = {"hits": 0, "misses": 0}
     
     def geocode_city(self, city_name: str) -> dict:
         """Находит координаты города"""
-        try:
-            url = "https://geocoding-api.open-meteo.com/v1/search"
-            params = {"name": city_name, "count": 1, "language": "ru", "format": "json"}
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            if "results" not in data or len(data["results"]) == 0:
-                return None
-            
-            result = data["results"][0]
-            return {
-                "name": result["name"],
-                "country": result.get("country", "Unknown"),
-                "latitude": result["latitude"],
-                "longitude": result["longitude"],
-            }
-        except Exception:
-            return None
+        return self.geocoder.lookup(city_name)
     
     def get_weather(self, city: str) -> dict:
         """Получает погоду из API"""
@@ -49,7 +69,10 @@ class WeatherTool:
             if location is None:
                 return {"error": f"Город '{city}' не найден"}
             
-            url = "https://api.open-meteo.com/v1/forecast"
+            cached = self._cached(location)
+            if cached is not None:
+                return cached
+            
             params = {
                 "latitude": location["latitude"],
                 "longitude": location["longitude"],
@@ -57,26 +80,126 @@ class WeatherTool:
                 "timezone": "auto"
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.http.get(self.forecast_url, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
-            weather = data["current_weather"]
-            
-            weather_codes = {
-                0: "ясно", 1: "малооблачно", 2: "облачно",
-                3: "пасмурно", 61: "дождь", 73: "снег", 95: "гроза"
-            }
-            
-            return {
-                "city": location["name"],
-                "temperature": weather["temperature"],
-                "windspeed": weather["windspeed"],
-                "description": weather_codes.get(weather["weathercode"], "неизвестно"),
-            }
+            return self._remember(location, data)
         except Exception as e:
             return {"error": str(e)}
     
+    @staticmethod
+    def _cache_key(location: dict) -> tuple:
+        return round(location["latitude"], 4), round(location["longitude"], 4)
+    
+    def _cached(self, location: dict):
+        """Погода из кэша, если Open-Meteo ещё не выпустил новый расчёт"""
+        with self._cache_lock:
+            entry = self._cache.get(self._cache_key(location))
+            if entry is not None and entry[0] > time.time():
+                self.cache_stats["hits"] += 1
+                return dict(entry[1])
+            self.cache_stats["misses"] += 1
+            return None
+    
+    @staticmethod
+    def _expires_at(data: dict) -> float:
+        """Когда ждать следующий расчёт: время текущего + интервал модели"""
+        now = time.time()
+        weather = data["current_weather"]
+        interval = weather.get("interval", DEFAULT_UPDATE_INTERVAL)
+        try:
+            # time - местное время точки (timezone=auto), сдвиг - utc_offset_seconds
+            observed = datetime.fromisoformat(weather["time"]).replace(tzinfo=timezone.utc).timestamp()
+            expires = observed - data.get("utc_offset_seconds", 0) + interval + UPDATE_GRACE
+        except (KeyError, TypeError, ValueError):
+            expires = now
+        return min(max(expires, now + MIN_CACHE_TTL), now + interval + UPDATE_GRACE)
+    
+    def _remember(self, location: dict, data: dict) -> dict:
+        """Форматирует ответ Open-Meteo и кладёт его в кэш"""
+        weather = self._format_weather(location, data["current_weather"])
+        with self._cache_lock:
+            self._cache[self._cache_key(location)] = (self._expires_at(data), weather)
+        return dict(weather)
+    
+    def _format_weather(self, location: dict, weather: dict) -> dict:
+        return {
+            "city": location["name"],
+            "temperature": weather["temperature"],
+            "windspeed": weather["windspeed"],
+            "description": WEATHER_CODES.get(weather["weathercode"], "неизвестно"),
+        }
+    
+    def _fetch_batch(self, batch: List[tuple]) -> Dict[str, dict]:
+        """Один запрос к Open-Meteo на несколько координат (через запятую)"""
+        params = {
+            "latitude": ",".join(str(location["latitude"]) for _, location in batch),
+            "longitude": ",".join(str(location["longitude"]) for _, location in batch),
+            "current_weather": True,
+            "timezone": "auto"
+        }
+        
+        try:
+            response = self.http.get(self.forecast_url, params=params, timeout=10)
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            return {city: {"error": str(e)} for city, _ in batch}
+        
+        # Для одной точки API возвращает объект, для нескольких - список
+        if isinstance(data, dict):
+            data = [data]
+        if not isinstance(data, list) or len(data) != len(batch):
+            error = f"Open-Meteo вернул неполный ответ: ожидалось {len(batch)} результатов"
+            return {city: {"error": error} for city, _ in batch}
+        
+        results = {}
+        for (city, location), item in zip(batch, data):
+            try:
+                results[city] = self._remember(location, item)
+            except (KeyError, TypeError, ValueError) as e:
+                # Один битый элемент не должен ронять всю пачку
+                results[city] = {"error": f"Некорректный ответ Open-Meteo: {e!r}"}
+        return results
+    
+    def get_weather_batch(self, cities: List[str], batch_size: int = 50,
+                          max_workers: int = 8) -> Dict[str, dict]:
+        """
+        Погода для многих городов сразу
+        
+        Координаты ищутся параллельно (обычно из кэша), прогноз запрашивается
+        пачками по batch_size точек, пачки - параллельно. Города, для которых
+        Open-Meteo ещё не выпустил новый расчёт, берутся из кэша без запроса.
+        
+        Returns:
+            {город из списка: результат как у get_weather}
+        """
+        cities = list(dict.fromkeys(cities))
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            locations = list(pool.map(self.geocode_city, cities))
+        
+        results = {}
+        found = []
+        for city, location in zip(cities, locations):
+            if location is None:
+                results[city] = {"error": f"Город '{city}' не найден"}
+                continue
+            # Города, для которых новых данных ещё нет, не запрашиваем
+            cached = self._cached(location)
+            if cached is not None:
+                results[city] = cached
+            else:
+                found.append((city, location))
+        
+        batches = [found[i:i + batch_size] for i in range(0, len(found), batch_size)]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for batch_results in pool.map(self._fetch_batch, batches):
+                results.update(batch_results)
+        
+        return {city: results[city] for city in cities}
+    
     def call(self, city: str) -> str:
         """Вызов инструмента"""
         data = self.get_weather(city)
@@ -92,10 +215,15 @@ class WeatherTool:
 class MCPServer:
     """MCP-сервер с погодой и историей"""
     
-    def __init__(self):
+    def __init__(self, weather_tool: WeatherTool = None, history_tool: WeatherHistoryTool = None):
+        """
+        Args:
+            weather_tool, history_tool: общие с другими задачами инструменты
+                                        (по умолчанию - свои)
+        """
         self.tools = {
-            "get_weather": WeatherTool(),
-            "weather_history": WeatherHistoryTool()
+            "get_weather": weather_tool or WeatherTool(),
+            "weather_history": history_tool or WeatherHistoryTool()
         }
     
     def get_tool_definitions(self):
@@ -117,18 +245,18 @@ class MCPServer:
             },
             {
                 "name": "weather_history",
-                "description": "Управление историей погоды. Действия: add (добавить), history (получить историю), stats (статистика)",
+                "description": "Управление историей погоды. Действия: add (добавить), history (получить историю), stats (статистика), range (история за период: часовые/суточные мин/макс/среднее для длинных периодов), analyze (готовые факты за период: перцентили, тренд в сутки, скорость изменения, скользящее среднее)",
                 "input_schema": {
                     "type": "object",
                     "properties": {
                         "action": {
                             "type": "string",
-                            "description": "Действие: 'add', 'history', 'stats'",
-                            "enum": ["add", "history", "stats"]
+                            "description": "Действие: 'add', 'history', 'stats', 'range', 'analyze'",
+                            "enum": ["add", "history", "stats", "range", "analyze"]
                         },
                         "city": {
                             "type": "string",
-                            "description": "Название города (для action=add)"
+                            "description": "Название города (для add обязательно, для остальных действий - фильтр)"
                         },
                         "temperature": {
                             "type": "number",
@@ -145,6 +273,23 @@ class MCPServer:
                         "limit": {
                             "type": "integer",
                             "description": "Количество записей (для action=history)"
+                        },
+                        "from": {
+                            "type": "string",
+                            "description": "Начало периода YYYY-MM-DD или YYYY-MM-DD HH:MM (для range/analyze)"
+                        },
+                        "to": {
+                            "type": "string",
+                            "description": "Конец периода (для range/analyze, по умолчанию - сейчас)"
+                        },
+                        "resolution": {
+                            "type": "string",
+                            "description": "Детальность для range/analyze: raw, 1h, 1d или auto",
+                            "enum": ["auto", "raw", "1h", "1d"]
+                        },
+                        "window_hours": {
+                            "type": "number",
+                            "description": "Окно скользящего среднего в часах (для action=analyze)"
                         }
                     },
                     "required": ["action"]
@@ -165,75 +310,132 @@ class MCPServer:
             return f"Ошибка: инструмент {tool_name} не найден"
 
 
+def estimate_message_tokens(message: Dict) -> int:
+    """Грубая оценка токенов сообщения (~3 символа на токен, как в token_budget)"""
+    content = message["content"]
+    if isinstance(content, str):
+        return len(content) // 3 + 1
+    # Блоки tool_use / tool_result: считаем по их текстовому представлению
+    return sum(len(str(block)) // 3 + 1 for block in content)
+
+
+def window_history(history: List[Dict], max_tokens: int) -> List[Dict]:
+    """
+    Хвост истории в пределах бюджета токенов
+    
+    Режет только по границам реплик пользователя (текстовых сообщений),
+    чтобы не разорвать пару tool_use / tool_result.
+    Последняя реплика остаётся всегда, даже если не влезает в бюджет.
+    """
+    total = 0
+    start = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        total += estimate_message_tokens(history[i])
+        message = history[i]
+        if message["role"] == "user" and isinstance(message["content"], str):
+            if total > max_tokens and start < len(history):
+                break
+            start = i
+    return history[start:]
+
+
 class ClaudeAgent:
     """Агент на Claude API"""
     
-    def __init__(self, api_key: str, mcp_server: MCPServer):
+    def __init__(self, api_key: str, mcp_server: MCPServer, history_mode: str = "full",
+                 history_tokens: int = DEFAULT_HISTORY_TOKENS):
+        """
+        Args:
+            history_mode: full / window / stateless (см. HISTORY_MODES)
+            history_tokens: бюджет истории в режиме window
+        """
+        if history_mode not in HISTORY_MODES:
+            raise ValueError(f"Неизвестный режим истории: {history_mode}")
+        
         self.client = Anthropic(api_key=api_key)
         self.mcp_server = mcp_server
+        self.history_mode = history_mode
+        self.history_tokens = history_tokens
         self.conversation_history = []
+        # Все tool_use одного ответа выполняются параллельно
+        self.tool_runner = ToolRunner(self.mcp_server.call_tool)
     
-    def chat(self, user_message: str, silent: bool = False) -> str:
-        """Отправляет сообщение Claude"""
+    def _messages_for_call(self, stateless: bool) -> List[Dict]:
+        """Сообщения, с которых начинается вызов"""
+        if stateless:
+            return []
+        if self.history_mode == "window":
+            return window_history(self.conversation_history, self.history_tokens)
+        return list(self.conversation_history)
+    
+    def _create(self, messages: List[Dict], use_tools: bool):
+        """Один запрос к Claude API"""
+        request = {
+            "model": "claude-sonnet-4-20250514",
+            "max_tokens": 2048,
+            "messages": messages
+        }
+        if use_tools:
+            request["tools"] = self.mcp_server.get_tool_definitions()
+        return self.client.messages.create(**request)
+    
+    def chat(self, user_message: str, silent: bool = False, stateless: bool = None,
+             use_tools: bool = True) -> str:
+        """
+        Отправляет сообщение Claude
+        
+        Args:
+            stateless: не читать и не пополнять историю (по умолчанию - по history_mode)
+            use_tools: False - все данные уже в сообщении, ответ за один запрос
+        """
+        if stateless is None:
+            stateless = self.history_mode == "stateless"
+        
+        # Стоимость вызова зависит только от бюджета истории, а не от времени работы
+        messages = self._messages_for_call(stateless)
         
         # Добавляем сообщение пользователя
-        self.conversation_history.append({
+        messages.append({
             "role": "user",
             "content": user_message
         })
         
         # Вызываем Claude API
-        response = self.client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=2048,
-            tools=self.mcp_server.get_tool_definitions(),
-            messages=self.conversation_history
-        )
+        response = self._create(messages, use_tools)
         
         # Обрабатываем вызовы инструментов
         while response.stop_reason == "tool_use":
-            tool_use = None
+            tool_uses = []
             assistant_message = []
             
             for block in response.content:
                 if block.type == "tool_use":
-                    tool_use = block
+                    tool_uses.append(block)
                     if not silent:
                         print(f"[Claude] Вызов: {block.name}")
                 assistant_message.append(block)
             
-            self.conversation_history.append({
+            messages.append({
                 "role": "assistant",
                 "content": assistant_message
             })
             
-            if tool_use:
-                # Вызываем инструмент через MCP
-                tool_result = self.mcp_server.call_tool(
-                    tool_name=tool_use.name,
-                    arguments=tool_use.input
-                )
+            if tool_uses:
+                # Вызываем все инструменты через MCP одновременно
+                start = time.perf_counter()
+                tool_results = self.tool_runner.run(tool_uses)
                 
                 if not silent:
-                    print(f"[MCP] Готово")
+                    print(f"[MCP] Готово: {len(tool_results)} за {time.perf_counter() - start:.2f} с")
                 
-                # Отправляем результат Claude
-                self.conversation_history.append({
+                # Все результаты - одним сообщением
+                messages.append({
                     "role": "user",
-                    "content": [{
-                        "type": "tool_result",
-                        "tool_use_id": tool_use.id,
-                        "content": tool_result
-                    }]
+                    "content": tool_results
                 })
                 
                 # Получаем финальный ответ
-                response = self.client.messages.create(
-                    model="claude-sonnet-4-20250514",
-                    max_tokens=2048,
-                    tools=self.mcp_server.get_tool_definitions(),
-                    messages=self.conversation_history
-                )
+                response = self._create(messages, use_tools)
         
         # Извлекаем текстовый ответ
         final_response = ""
@@ -241,23 +443,38 @@ class ClaudeAgent:
             if hasattr(block, "text"):
                 final_response += block.text
         
-        self.conversation_history.append({
+        messages.append({
             "role": "assistant",
             "content": final_response
         })
         
+        if not stateless:
+            # В режиме window и сама история не растёт без границ
+            if self.history_mode == "window":
+                messages = window_history(messages, self.history_tokens)
+            self.conversation_history = messages
+        
         return final_response
 
 
-def create_agent():
-    """Создаёт агента с MCP-сервером"""
+def create_agent(history_mode: str = "full", history_tokens: int = DEFAULT_HISTORY_TOKENS,
+                 weather_tool: WeatherTool = None, history_tool: WeatherHistoryTool = None):
+    """
+    Создаёт агента с MCP-сервером
+    
+    Args:
+        history_mode: full для чата, stateless для daemon-ов (см. HISTORY_MODES)
+        history_tokens: бюджет истории в режиме window
+        weather_tool, history_tool: общие инструменты для MCP-сервера (кэши, хранилище)
+    """
     api_key = os.getenv("ANTHROPIC_API_KEY")
     
     if not api_key:
         print("Ошибка: API ключ не найден!")
         return None
     
-    mcp_server = MCPServer()
-    agent = ClaudeAgent(api_key=api_key, mcp_server=mcp_server)
+    mcp_server = MCPServer(weather_tool, history_tool)
+    agent = ClaudeAgent(api_key=api_key, mcp_server=mcp_server,
+                        history_mode=history_mode, history_tokens=history_tokens)
     
     return agent
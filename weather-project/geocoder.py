@@ -0,0 +1,218 @@
+"""
+Геокодирование городов без лишних запросов к Open-Meteo
+Координаты города не меняются, поэтому поиск идёт по уровням:
+    1. LRU в памяти процесса
+    2. встроенный справочник крупных городов (русские и латинские названия)
+    3. кэш на диске (geocode_cache.json)
+    4. geocoding-api.open-meteo.com - результат сохраняется в кэш
+
+Использование:
+    geocoder = Geocoder()
+    geocoder.lookup("Варшава")   # {"name", "country", "latitude", "longitude", "admin1"}
+    geocoder.lookup("warsaw")    # тот же город, без запроса к API
+"""
+
+import json
+import os
+import sys
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Общие модули (http_client) лежат в корне репозитория
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from http_client import HttpClient, get_default_client
+
+GEOCODING_URL = "https://geocoding-api.open-meteo.com/v1/search"
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "geocode_cache.json")
+
+# (название как у Open-Meteo с language=ru, страна, широта, долгота, варианты написания)
+GAZETTEER_CITIES = [
+    ("Варшава", "Польша", 52.22977, 21.01178, ["Warsaw", "Warszawa"]),
+    ("Краков", "Польша", 50.06143, 19.93658, ["Krakow", "Kraków", "Cracow"]),
+    ("Гданьск", "Польша", 54.35205, 18.64637, ["Gdansk", "Gdańsk"]),
+    ("Вроцлав", "Польша", 51.1, 17.03333, ["Wroclaw", "Wrocław"]),
+    ("Познань", "Польша", 52.40692, 16.92993, ["Poznan", "Poznań"]),
+    ("Лодзь", "Польша", 51.75, 19.46667, ["Lodz", "Łódź"]),
+    ("Москва", "Россия", 55.75222, 37.61556, ["Moscow", "Moskva"]),
+    ("Санкт-Петербург", "Россия", 59.93863, 30.31413, ["Saint Petersburg", "St Petersburg", "Петербург"]),
+    ("Новосибирск", "Россия", 55.0415, 82.9346, ["Novosibirsk"]),
+    ("Екатеринбург", "Россия", 56.8519, 60.6122, ["Yekaterinburg", "Ekaterinburg"]),
+    ("Казань", "Россия", 55.78874, 49.12214, ["Kazan"]),
+    ("Киев", "Украина", 50.45466, 30.5238, ["Kyiv", "Kiev", "Київ"]),
+    ("Минск", "Беларусь", 53.9, 27.56667, ["Minsk"]),
+    ("Вильнюс", "Литва", 54.68916, 25.2798, ["Vilnius"]),
+    ("Рига", "Латвия", 56.946, 24.10589, ["Riga"]),
+    ("Таллин", "Эстония", 59.43696, 24.75353, ["Tallinn"]),
+    ("Хельсинки", "Финляндия", 60.16952, 24.93545, ["Helsinki"]),
+    ("Стокгольм", "Швеция", 59.32938, 18.06871, ["Stockholm"]),
+    ("Осло", "Норвегия", 59.91273, 10.74609, ["Oslo"]),
+    ("Копенгаген", "Дания", 55.67594, 12.56553, ["Copenhagen", "København"]),
+    ("Берлин", "Германия", 52.52437, 13.41053, ["Berlin"]),
+    ("Мюнхен", "Германия", 48.13743, 11.57549, ["Munich", "München"]),
+    ("Прага", "Чехия", 50.08804, 14.42076, ["Prague", "Praha"]),
+    ("Вена", "Австрия", 48.20849, 16.37208, ["Vienna", "Wien"]),
+    ("Будапешт", "Венгрия", 47.49835, 19.04045, ["Budapest"]),
+    ("Бухарест", "Румыния", 44.43225, 26.10626, ["Bucharest", "București"]),
+    ("Амстердам", "Нидерланды", 52.37403, 4.88969, ["Amsterdam"]),
+    ("Брюссель", "Бельгия", 50.85045, 4.34878, ["Brussels", "Bruxelles"]),
+    ("Париж", "Франция", 48.85341, 2.3488, ["Paris"]),
+    ("Лондон", "Великобритания", 51.50853, -0.12574, ["London"]),
+    ("Мадрид", "Испания", 40.4165, -3.70256, ["Madrid"]),
+    ("Лиссабон", "Португалия", 38.71667, -9.13333, ["Lisbon", "Lisboa"]),
+    ("Рим", "Италия", 41.89193, 12.51133, ["Rome", "Roma"]),
+    ("Стамбул", "Турция", 41.01384, 28.94966, ["Istanbul", "İstanbul"]),
+    ("Тбилиси", "Грузия", 41.69411, 44.83368, ["Tbilisi"]),
+    ("Ереван", "Армения", 40.18111, 44.51361, ["Yerevan"]),
+    ("Алматы", "Казахстан", 43.25, 76.91667, ["Almaty", "Алма-Ата"]),
+    ("Дубай", "ОАЭ", 25.07725, 55.30927, ["Dubai"]),
+    ("Нью-Йорк", "США", 40.71427, -74.00597, ["New York", "NYC"]),
+    ("Токио", "Япония", 35.6895, 139.69171, ["Tokyo"]),
+    ("Пекин", "Китай", 39.9075, 116.39723, ["Beijing", "Peking"]),
+]
+
+
+def normalize_city(name: str) -> str:
+    """Ключ поиска: регистр, пробелы, ё/е и диакритика не важны"""
+    name = " ".join(name.split()).casefold().replace("ё", "е")
+    decomposed = unicodedata.normalize("NFKD", name)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _build_gazetteer() -> Dict[str, Dict]:
+    gazetteer = {}
+    for name, country, latitude, longitude, aliases in GAZETTEER_CITIES:
+        location = {
+            "name": name,
+            "country": country,
+            "latitude": latitude,
+            "longitude": longitude,
+            "admin1": "",
+        }
+        for alias in [name] + aliases:
+            gazetteer[normalize_city(alias)] = location
+    return gazetteer
+
+
+GAZETTEER = _build_gazetteer()
+
+
+def canonical_city(name: str) -> str:
+    """Один ключ для всех написаний города из справочника ("Warsaw" == "Варшава")"""
+    key = normalize_city(name)
+    location = GAZETTEER.get(key)
+    return normalize_city(location["name"]) if location else key
+
+
+class Geocoder:
+    """Координаты городов: память → справочник → диск → API"""
+
+    def __init__(self, cache_path: str = DEFAULT_CACHE_PATH, memory_size: int = 256,
+                 timeout: float = 10, http: HttpClient = None, url: str = GEOCODING_URL):
+        """
+        Args:
+            cache_path: JSON-файл с найденными через API городами (None - не сохранять)
+            memory_size: сколько городов держать в LRU
+            timeout: таймаут запроса к API геокодирования
+            http: HTTP-клиент (по умолчанию общий на процесс)
+            url: адрес API геокодирования (можно подменить заглушкой)
+        """
+        self.http = http or get_default_client()
+        self.url = url
+        self.cache_path = cache_path
+        self.memory_size = memory_size
+        self.timeout = timeout
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = self._load_disk_cache()
+
+        self.stats = {"memory": 0, "gazetteer": 0, "disk": 0, "network": 0, "not_found": 0}
+
+    def _load_disk_cache(self) -> Dict[str, Dict]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Не удалось прочитать кэш геокодирования {self.cache_path}: {e}")
+            return {}
+
+    def _save_disk_cache(self):
+        """Атомарная запись: файл не бывает обрезанным"""
+        if not self.cache_path:
+            return
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._disk, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.cache_path)
+
+    def _remember(self, key: str, location: Optional[Dict]):
+        self._memory[key] = location
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def fetch(self, city_name: str) -> Optional[Dict]:
+        """Запрос к geocoding-api.open-meteo.com (исключение - при сбое сети)"""
+        params = {"name": city_name, "count": 1, "language": "ru", "format": "json"}
+
+        response = self.http.get(self.url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+
+        data = response.json()
+        if "results" not in data or len(data["results"]) == 0:
+            return None
+
+        result = data["results"][0]
+        return {
+            "name": result["name"],
+            "country": result.get("country", "Unknown"),
+            "latitude": result["latitude"],
+            "longitude": result["longitude"],
+            "admin1": result.get("admin1", ""),
+        }
+
+    def lookup(self, city_name: str) -> Optional[Dict]:
+        """
+        Координаты города
+
+        Returns:
+            {"name", "country", "latitude", "longitude", "admin1"} или None,
+            если город не найден или API недоступен
+        """
+        key = normalize_city(city_name)
+        if not key:
+            return None
+
+        with self._lock:
+            if key in self._memory:
+                self.stats["memory"] += 1
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+            for level, source in (("gazetteer", GAZETTEER), ("disk", self._disk)):
+                if key in source:
+                    self.stats[level] += 1
+                    self._remember(key, source[key])
+                    return source[key]
+
+        try:
+            location = self.fetch(city_name)
+        except Exception:
+            # Сбой сети не кэшируем - в следующий раз попробуем снова
+            return None
+
+        with self._lock:
+            self.stats["network"] += 1
+            # "Не найден" помним только в памяти: справочник API может пополниться
+            self._remember(key, location)
+            if location is None:
+                self.stats["not_found"] += 1
+            else:
+                self._disk[key] = location
+                self._save_disk_cache()
+
+        return location
@@ -0,0 +1,183 @@
+"""
+Планировщик периодических задач в одном процессе
+Сборщик и summary (и любые будущие задачи) работают в одном интерпретаторе
+и делят кэши (геокодер, HTTP-пул, статистику хранилища).
+    - расписание по монотонным часам: запуск k - ровно start + k * interval,
+      длительность задачи не сдвигает следующие запуски
+    - пропущенные запуски (задача шла дольше интервала, сон ноутбука)
+      не выполняются пачкой - один запуск и дальше по сетке
+    - задача не запускается, пока не закончился её прошлый запуск
+    - джиттер: случайная задержка старта, чтобы задачи не били в API одновременно
+    - метрики по задачам: запуски, ошибки, пропуски, время выполнения
+
+Использование:
+    scheduler = Scheduler()
+    scheduler.add_job("collector", collect, interval=120)
+    scheduler.add_job("summary", summarize, interval=600, jitter=5)
+    scheduler.run_forever()   # до Ctrl+C
+"""
+
+import random
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from weather_stats import RunningStats
+
+
+class Job:
+    """Периодическая задача и её метрики"""
+
+    def __init__(self, name: str, func: Callable[[], object], interval: float,
+                 jitter: float = 0.0, delay: float = 0.0):
+        """
+        Args:
+            name: имя задачи в логах и метриках
+            func: функция без аргументов
+            interval: период, сек
+            jitter: случайная задержка старта до jitter сек (сетка не сдвигается)
+            delay: через сколько секунд после старта планировщика первый запуск
+        """
+        if interval <= 0:
+            raise ValueError(f"Интервал задачи {name} должен быть больше нуля")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.delay = delay
+
+        self.anchor = None      # момент запуска №0 по монотонным часам
+        self.slot = 0           # номер следующего запуска по сетке
+        self.next_run = None    # когда запускать (сетка + джиттер)
+        self.running = False
+
+        self.runs = 0
+        self.failures = 0
+        self.missed = 0         # слоты, пропущенные из-за опоздания
+        self.overlaps = 0       # слоты, пропущенные из-за незавершённого запуска
+        self.durations = RunningStats()
+        self.last_duration = None
+        self.last_error = None
+
+    def schedule(self, now: float):
+        """Следующий слот сетки, не раньше now"""
+        due = self.anchor + self.slot * self.interval
+        if due < now - self.interval:
+            # Опоздали больше чем на период: лишние слоты не догоняем
+            behind = int((now - due) // self.interval)
+            self.missed += behind
+            self.slot += behind
+            due = self.anchor + self.slot * self.interval
+        self.next_run = due + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def metrics(self) -> Dict:
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "missed": self.missed,
+            "overlaps": self.overlaps,
+            "running": self.running,
+            "last_duration": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "duration": {
+                "avg": round(self.durations.mean, 3),
+                "max": round(self.durations.max, 3) if self.durations.max is not None else None,
+            },
+            "last_error": self.last_error,
+        }
+
+
+class Scheduler:
+    """Запускает задачи по сетке монотонного времени в пуле потоков"""
+
+    def __init__(self, max_workers: int = 4):
+        """
+        Args:
+            max_workers: сколько задач могут выполняться одновременно
+        """
+        self.jobs: List[Job] = []
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+    def add_job(self, name: str, func: Callable[[], object], interval: float,
+                jitter: float = 0.0, delay: float = 0.0) -> Job:
+        """Добавляет задачу (можно и во время работы)"""
+        job = Job(name, func, interval, jitter, delay)
+        with self._lock:
+            self.jobs.append(job)
+        self._wakeup.set()
+        return job
+
+    def _execute(self, job: Job):
+        start = time.monotonic()
+        try:
+            job.func()
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = f"{type(e).__name__}: {e}"
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Ошибка задачи {job.name}: {e}")
+            traceback.print_exc()
+        finally:
+            duration = time.monotonic() - start
+            with self._lock:
+                job.runs += 1
+                job.last_duration = duration
+                job.durations.add(duration)
+                job.running = False
+
+    def _tick(self, now: float) -> float:
+        """Запускает созревшие задачи, возвращает время до следующей"""
+        with self._lock:
+            for job in self.jobs:
+                if job.anchor is None:
+                    job.anchor = now + job.delay
+                    job.schedule(now)
+                if job.next_run > now:
+                    continue
+
+                if job.running:
+                    # Прошлый запуск ещё идёт - этот слот пропускаем
+                    job.overlaps += 1
+                    print(f"[{datetime.now().strftime('%H:%M:%S')}] {job.name}: "
+                          f"прошлый запуск не завершён - пропуск")
+                else:
+                    job.running = True
+                    self.pool.submit(self._execute, job)
+
+                job.slot += 1
+                job.schedule(now)
+
+            if not self.jobs:
+                return 60.0
+            return max(0.0, min(job.next_run for job in self.jobs) - now)
+
+    def run_forever(self):
+        """Главный цикл (до stop() или Ctrl+C)"""
+        try:
+            while not self._stop.is_set():
+                timeout = self._tick(time.monotonic())
+                self._wakeup.wait(timeout)
+                self._wakeup.clear()
+        finally:
+            self.pool.shutdown(wait=True)
+
+    def start(self) -> threading.Thread:
+        """Главный цикл в фоновом потоке"""
+        thread = threading.Thread(target=self.run_forever, name="scheduler", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Метрики по задачам"""
+        with self._lock:
+            return {job.name: job.metrics() for job in self.jobs}
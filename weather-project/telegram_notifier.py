@@ -3,18 +3,29 @@
 """
 
 import os
-import requests
+import sys
 from dotenv import load_dotenv
 
+# Общие модули (http_client) лежат в корне репозитория
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from http_client import HttpClient, get_default_client
+
 load_dotenv()
 
 
 class TelegramNotifier:
     """Отправка уведомлений в Telegram"""
     
-    def __init__(self):
+    def __init__(self, http: HttpClient = None, api_url: str = "https://api.telegram.org"):
+        """
+        Args:
+            http: HTTP-клиент (по умолчанию общий на процесс)
+            api_url: адрес Bot API (можно подменить локальной заглушкой)
+        """
         self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
         self.chat_id = os.getenv("TELEGRAM_CHAT_ID")
+        self.http = http or get_default_client()
+        self.api_url = api_url
         
         if not self.bot_token or not self.chat_id:
             print("⚠️ Предупреждение: Telegram токен или chat_id не найдены")
@@ -23,6 +34,29 @@ class TelegramNotifier:
         else:
             self.enabled = True
     
+    def post_message(self, text: str, retry: bool = True):
+        """
+        Один запрос sendMessage без обработки ошибок
+        
+        Args:
+            retry: повторять ли запрос внутри HTTP-клиента (очередь повторяет сама)
+        
+        Returns:
+            Ответ Bot API (статус не проверяется)
+        """
+        url = f"{self.api_url}/bot{self.bot_token}/sendMessage"
+        
+        data = {
+            "chat_id": self.chat_id,
+            "text": text,
+            "parse_mode": "HTML"  # Поддержка HTML форматирования
+        }
+        
+        if not retry:
+            return self.http.request("POST", url, data=data, timeout=10, retries=0)
+        # POST не идемпотентен: повтор только после 429 и обрыва соединения
+        return self.http.post(url, data=data, timeout=10)
+    
     def send_message(self, text: str) -> bool:
         """
         Отправить сообщение в Telegram
@@ -40,15 +74,7 @@ class TelegramNotifier:
             return False
         
         try:
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-            
-            data = {
-                "chat_id": self.chat_id,
-                "text": text,
-                "parse_mode": "HTML"  # Поддержка HTML форматирования
-            }
-            
-            response = requests.post(url, data=data, timeout=10)
+            response = self.post_message(text)
             response.raise_for_status()
             
             print("✅ Сообщение отправлено в Telegram!")
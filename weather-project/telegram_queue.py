@@ -0,0 +1,307 @@
+"""
+Фоновая очередь доставки сообщений в Telegram
+send_message только кладёт текст в очередь и сразу возвращается - медленный
+или ограничивающий частоту Bot API не тормозит daemon. Отправляет фоновый поток:
+    - не чаще min_interval секунд и max_per_minute сообщений в минуту
+    - ответ 429 - ждёт parameters.retry_after (или заголовок Retry-After)
+    - сбой сети и 5xx - повтор с экспоненциальной задержкой
+    - сообщения, накопившиеся за coalesce_window секунд, уходят одним дайджестом;
+      если Telegram отклонил дайджест (400/403), его сообщения отправляются
+      по одному и пропускается только то, которое отклонено
+    - сообщение длиннее лимита Bot API делится по строкам на несколько отправок
+      (теги внутри строки не разрываются; тег, открытый на одной строке
+      и закрытый на другой, может попасть в разные части)
+    - неотправленное хранится на диске (telegram_queue.json) и доставляется
+      после перезапуска
+Сообщение удаляется из очереди только после успешной отправки.
+
+Использование:
+    queue = TelegramQueue()
+    queue.send_message("<b>Summary</b>")   # не блокирует
+    print(queue.metrics())
+    queue.close()                          # дослать что успеем, остальное - на диске
+
+Для проверки достаточно локальной заглушки Bot API:
+    notifier = TelegramNotifier(api_url="http://127.0.0.1:8081")
+    queue = TelegramQueue(notifier, queue_path="/tmp/queue.json")
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from telegram_notifier import TelegramNotifier
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "telegram_queue.json")
+# Ограничение Bot API на длину одного сообщения
+MAX_MESSAGE_LENGTH = 4096
+DIGEST_SEPARATOR = "\n\n- - -\n\n"
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """
+    Делит текст на части не длиннее limit по границам строк
+
+    Строка длиннее limit делится по последнему пробелу (или по символам, если пробелов нет).
+    HTML-разметка не учитывается: тег, охватывающий несколько строк, может
+    оказаться разорван между частями.
+    """
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit + 1)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n ")
+    parts.append(text)
+    return parts
+
+
+class TelegramQueue:
+    """Неблокирующая отправка в Telegram с повторами, лимитами и дайджестами"""
+
+    def __init__(self, notifier: TelegramNotifier = None, queue_path: str = DEFAULT_QUEUE_PATH,
+                 min_interval: float = 1.0, max_per_minute: int = 20, coalesce_window: float = 2.0,
+                 backoff: float = 1.0, max_backoff: float = 300.0):
+        """
+        Args:
+            notifier: отправитель (по умолчанию TelegramNotifier из .env)
+            queue_path: JSON-файл с неотправленными сообщениями (None - только в памяти)
+            min_interval: минимальная пауза между отправками, сек
+            max_per_minute: не больше стольких отправок за 60 секунд
+            coalesce_window: сколько ждать продолжения пачки перед отправкой, сек
+            backoff: базовая задержка повтора после ошибки, сек (растёт как 2^попытка)
+            max_backoff: верхняя граница задержки повтора, сек
+        """
+        self.notifier = notifier or TelegramNotifier()
+        self.queue_path = queue_path
+        self.min_interval = min_interval
+        self.max_per_minute = max_per_minute
+        self.coalesce_window = coalesce_window
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._pending = deque(self._load())  # {"text", "created"}
+        self._cond = threading.Condition()
+        self._closing = False
+        self._deadline = None
+        self._sent_times = deque()
+        self._next_send = 0.0
+        self._failures = 0  # ошибок подряд - для экспоненциальной задержки
+
+        self.stats = {"enqueued": 0, "delivered": 0, "sent": 0, "digests": 0,
+                      "retries": 0, "rate_limited": 0, "dropped": 0, "last_error": None}
+
+        self._worker = None
+        if self.enabled:
+            self._worker = threading.Thread(target=self._run, name="telegram-queue", daemon=True)
+            self._worker.start()
+
+    @property
+    def enabled(self) -> bool:
+        return self.notifier.enabled
+
+    def _load(self) -> List[Dict]:
+        if not self.queue_path or not os.path.exists(self.queue_path):
+            return []
+        try:
+            with open(self.queue_path, "r", encoding="utf-8") as f:
+                pending = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Не удалось прочитать очередь Telegram {self.queue_path}: {e}")
+            return []
+        if pending:
+            print(f"📨 Неотправленных сообщений с прошлого запуска: {len(pending)}")
+        # Очередь могла сохранить версия без деления длинных сообщений
+        return [{"text": part, "created": item["created"]}
+                for item in pending for part in split_message(item["text"])]
+
+    def _save(self):
+        """Атомарная запись очереди (вызывается под self._cond)"""
+        if not self.queue_path:
+            return
+        tmp_path = self.queue_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(list(self._pending), f, ensure_ascii=False)
+        os.replace(tmp_path, self.queue_path)
+
+    def send_message(self, text: str) -> bool:
+        """
+        Ставит сообщение в очередь (не блокирует)
+
+        Returns:
+            True если сообщение принято к отправке
+        """
+        if not self.enabled:
+            # Отправитель сам покажет сообщение в консоли
+            return self.notifier.send_message(text)
+
+        with self._cond:
+            if self._closing:
+                return False
+            created = time.time()
+            parts = split_message(text)
+            self._pending.extend({"text": part, "created": created} for part in parts)
+            self.stats["enqueued"] += len(parts)
+            self._save()
+            self._cond.notify()
+        return True
+
+    def _take_batch(self) -> List[Dict]:
+        """Первые сообщения очереди, которые влезают в одно сообщение Telegram"""
+        batch, length = [], 0
+        for item in self._pending:
+            extra = len(item["text"]) + (len(DIGEST_SEPARATOR) if batch else 0)
+            if batch and length + extra > MAX_MESSAGE_LENGTH:
+                break
+            # Сообщения из отклонённого дайджеста отправляются по одному
+            if batch and (item.get("alone") or batch[0].get("alone")):
+                break
+            batch.append(item)
+            length += extra
+        return batch
+
+    def _rate_delay(self, now: float) -> float:
+        """Сколько ждать до отправки по лимитам частоты"""
+        while self._sent_times and self._sent_times[0] <= now - 60:
+            self._sent_times.popleft()
+        delay = self._next_send - now
+        if len(self._sent_times) >= self.max_per_minute:
+            delay = max(delay, self._sent_times[0] + 60 - now)
+        return max(0.0, delay)
+
+    def _deliver(self, text: str) -> Optional[float]:
+        """
+        Одна попытка отправки
+
+        Returns:
+            None при успехе, иначе через сколько секунд повторить
+            (-1 - ошибка постоянная, повтор бесполезен)
+        """
+        try:
+            response = self.notifier.post_message(text, retry=False)
+        except Exception as e:
+            self.stats["last_error"] = str(e)
+            return self._retry_delay()
+
+        if response.ok:
+            self._failures = 0
+            return None
+
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        self.stats["last_error"] = f"{response.status_code}: {payload.get('description', response.reason)}"
+
+        if response.status_code == 429:
+            self.stats["rate_limited"] += 1
+            retry_after = payload.get("parameters", {}).get("retry_after") or response.headers.get("Retry-After")
+            try:
+                return float(retry_after)
+            except (TypeError, ValueError):
+                return self._retry_delay()
+        if response.status_code >= 500:
+            return self._retry_delay()
+        # 400/403: неверный текст, бот заблокирован - повтор не поможет
+        return -1
+
+    def _retry_delay(self) -> float:
+        self._failures += 1
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** self._failures))
+
+    def _run(self):
+        """Фоновый поток доставки"""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closing)
+                if not self._pending:
+                    return
+
+                # Пачка: ждём, пока сообщения перестанут приходить (но не бесконечно)
+                now = time.time()
+                quiet = self._pending[-1]["created"] + self.coalesce_window - now
+                waited = now - self._pending[0]["created"]
+                if not self._closing and quiet > 0 and waited < 5 * self.coalesce_window:
+                    self._cond.wait(quiet)
+                    continue
+
+                delay = self._rate_delay(time.monotonic())
+                if delay > 0:
+                    if self._closing and time.monotonic() + delay > self._deadline:
+                        return
+                    self._cond.wait(delay)
+                    continue
+
+                batch = self._take_batch()
+
+            # Части длинного сообщения и дайджест уже не длиннее MAX_MESSAGE_LENGTH
+            retry_in = self._deliver(DIGEST_SEPARATOR.join(item["text"] for item in batch))
+
+            with self._cond:
+                now = time.monotonic()
+                self._sent_times.append(now)
+                self._next_send = now + self.min_interval
+
+                if retry_in is not None and retry_in < 0 and len(batch) > 1:
+                    # Отклонён дайджест - виновато, скорее всего, одно сообщение:
+                    # отправляем по одному, чтобы не потерять остальные
+                    for item in batch:
+                        item["alone"] = True
+                    self._save()
+                    print(f"⚠️  Telegram отклонил дайджест ({self.stats['last_error']}) - "
+                          f"сообщения ({len(batch)}) уйдут по одному")
+                elif retry_in is None or retry_in < 0:
+                    # Доставлено или повторять бесполезно - убираем из очереди
+                    for _ in batch:
+                        self._pending.popleft()
+                    self._save()
+                    if retry_in is None:
+                        self.stats["sent"] += 1
+                        self.stats["delivered"] += len(batch)
+                        self.stats["digests"] += len(batch) > 1
+                    else:
+                        self.stats["dropped"] += len(batch)
+                        print(f"❌ Telegram отклонил сообщение ({self.stats['last_error']}) - пропуск")
+                else:
+                    self.stats["retries"] += 1
+                    self._next_send = now + retry_in
+                    print(f"[{datetime.now().strftime('%H:%M:%S')}] Telegram: {self.stats['last_error']}, "
+                          f"повтор через {retry_in:.1f} с")
+
+    def depth(self) -> int:
+        """Сколько сообщений ждёт отправки"""
+        with self._cond:
+            return len(self._pending)
+
+    def metrics(self) -> Dict:
+        """Глубина очереди, возраст старейшего сообщения и счётчики"""
+        with self._cond:
+            oldest = self._pending[0]["created"] if self._pending else None
+            return {
+                "depth": len(self._pending),
+                "oldest_age": round(time.time() - oldest, 1) if oldest else None,
+                **self.stats,
+            }
+
+    def close(self, timeout: float = 10.0) -> int:
+        """
+        Останавливает поток, пытаясь дослать очередь за timeout секунд
+
+        Returns:
+            Сколько сообщений осталось (они сохранены на диске)
+        """
+        with self._cond:
+            self._closing = True
+            self._deadline = time.monotonic() + timeout
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout)
+        return self.depth()
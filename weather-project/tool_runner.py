@@ -0,0 +1,69 @@
+"""
+Параллельный вызов инструментов из одного ответа Claude
+Если Claude просит несколько tool_use сразу (например, погоду в пяти городах),
+все они выполняются одновременно в пуле потоков, каждый со своим таймаутом,
+а результаты уходят обратно одним сообщением пользователя.
+
+Использование:
+    runner = ToolRunner(mcp_server.call_tool)
+    tool_results = runner.run(tool_uses)
+    messages.append({"role": "user", "content": tool_results})
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Callable, Dict, List
+
+# Таймауты инструментов, сек (HTTP-клиент сам повторяет запросы внутри этого времени)
+TOOL_TIMEOUTS = {"get_weather": 30, "weather_history": 10}
+DEFAULT_TOOL_TIMEOUT = 30
+
+
+class ToolRunner:
+    """Выполняет все tool_use одного ответа параллельно"""
+
+    def __init__(self, call_tool: Callable[[str, dict], str], timeouts: Dict[str, float] = None,
+                 default_timeout: float = DEFAULT_TOOL_TIMEOUT, max_workers: int = 8):
+        """
+        Args:
+            call_tool: функция (имя инструмента, аргументы) -> текст результата
+            timeouts: таймауты по именам инструментов (по умолчанию TOOL_TIMEOUTS)
+            default_timeout: таймаут инструментов, которых нет в timeouts
+            max_workers: сколько инструментов выполнять одновременно
+        """
+        self.call_tool = call_tool
+        self.timeouts = TOOL_TIMEOUTS if timeouts is None else timeouts
+        self.default_timeout = default_timeout
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+
+    def run(self, tool_uses: List) -> List[Dict]:
+        """
+        Выполняет блоки tool_use
+
+        Returns:
+            Блоки tool_result в том же порядке (ошибки и таймауты - с is_error)
+        """
+        start = time.monotonic()
+        futures = [self.pool.submit(self.call_tool, tool_use.name, tool_use.input)
+                   for tool_use in tool_uses]
+
+        results = []
+        for tool_use, future in zip(tool_uses, futures):
+            timeout = self.timeouts.get(tool_use.name, self.default_timeout)
+            # Все инструменты стартовали одновременно - ждём только остаток их таймаута
+            remaining = max(0.0, start + timeout - time.monotonic())
+            result = {"type": "tool_result", "tool_use_id": tool_use.id}
+            try:
+                result["content"] = future.result(timeout=remaining)
+            except TimeoutError:
+                future.cancel()
+                result["content"] = f"Ошибка: инструмент {tool_use.name} не ответил за {timeout} с"
+                result["is_error"] = True
+            except Exception as e:
+                result["content"] = f"Ошибка инструмента {tool_use.name}: {e}"
+                result["is_error"] = True
+            results.append(result)
+        return results
+
+    def close(self):
+        self.pool.shutdown(wait=False)
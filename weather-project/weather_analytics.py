@@ -0,0 +1,91 @@
+"""
+Аналитика истории погоды на NumPy
+Данные берутся из WeatherStore столбцами (время, температура, ветер) и
+обрабатываются векторно: перцентили, линейный тренд, скорость изменения,
+скользящее среднее. Результат - компактный JSON с готовыми фактами
+для summary, чтобы Claude не считал их по тексту истории.
+"""
+
+from typing import Dict
+
+import numpy as np
+
+from weather_store import WeatherStore
+from weather_stats import METRICS
+
+PERCENTILES = [10, 50, 90]
+
+
+def rolling_mean(ts: np.ndarray, values: np.ndarray, window: float) -> np.ndarray:
+    """Среднее за последние window секунд для каждой точки (ts по возрастанию)"""
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    left = np.searchsorted(ts, ts - window, side="left")
+    right = np.arange(1, len(ts) + 1)
+    return (cumulative[right] - cumulative[left]) / (right - left)
+
+
+def trend_per_day(ts: np.ndarray, values: np.ndarray) -> float:
+    """Наклон линейного тренда (метод наименьших квадратов), единиц в сутки"""
+    if len(ts) < 2:
+        return 0.0
+    t = ts - ts.mean()
+    denominator = np.dot(t, t)
+    if denominator == 0:
+        return 0.0
+    return float(np.dot(t, values - values.mean()) / denominator * 86400)
+
+
+def describe(ts: np.ndarray, values: np.ndarray, window: float) -> Dict:
+    """Сводка одной метрики"""
+    percentiles = np.percentile(values, PERCENTILES)
+
+    # Скорость изменения между соседними точками, единиц в час
+    hours = np.diff(ts) / 3600
+    valid = hours > 0
+    rates = np.diff(values)[valid] / hours[valid]
+
+    rolling = rolling_mean(ts, values, window)
+    slope = trend_per_day(ts, values)
+
+    return {
+        "min": round(float(values.min()), 2),
+        "max": round(float(values.max()), 2),
+        "mean": round(float(values.mean()), 2),
+        **{f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, percentiles)},
+        "trend_per_day": round(slope, 3),
+        "trend": "рост" if slope > 0.1 else "снижение" if slope < -0.1 else "стабильно",
+        "rate_per_hour": {
+            "last": round(float(rates[-1]), 3) if len(rates) else 0.0,
+            "max_abs": round(float(np.abs(rates).max()), 3) if len(rates) else 0.0,
+        },
+        "rolling_mean": {
+            "last": round(float(rolling[-1]), 2),
+            "min": round(float(rolling.min()), 2),
+            "max": round(float(rolling.max()), 2),
+        },
+    }
+
+
+def analyze(store: WeatherStore, city: str, from_ts: float, to_ts: float,
+            resolution: str = "auto", window_hours: float = 3) -> Dict:
+    """
+    Векторная аналитика города за период
+
+    Args:
+        resolution: уровень хранения (raw / 1h / 1d / auto)
+        window_hours: окно скользящего среднего, часов
+
+    Returns:
+        {"city", "resolution", "points", "window_hours", "temperature": {...}, "windspeed": {...}}
+    """
+    tier, columns = store.columns(city, from_ts, to_ts, resolution)
+    ts = np.asarray(columns["ts"], dtype=np.float64)
+
+    result = {"city": city, "resolution": tier, "points": int(len(ts)), "window_hours": window_hours}
+    if not len(ts):
+        return result
+
+    for metric in METRICS:
+        values = np.asarray(columns[metric], dtype=np.float64)
+        result[metric] = describe(ts, values, window_hours * 3600)
+    return result
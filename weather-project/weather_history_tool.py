@@ -3,112 +3,163 @@
 """
 
 import json
-import os
+import time
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Tuple
+from weather_analytics import analyze
+from weather_store import ROLLUPS, WeatherStore
+
+RESOLUTIONS = ["raw", *ROLLUPS, "auto"]
+DATE_FORMATS = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d"]
+
+
+def parse_date(text: str) -> float:
+    """Дата/время из строки (локальное время) в timestamp"""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text.strip(), fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"Неверный формат даты: '{text}' (ожидается YYYY-MM-DD или YYYY-MM-DD HH:MM)")
+
+
+def parse_period(date_from: str, date_to: str, resolution: str) -> Tuple[float, float]:
+    """Границы периода в timestamp (по умолчанию - последние сутки) с проверкой разрешения"""
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"неизвестное разрешение '{resolution}' ({', '.join(RESOLUTIONS)})")
+    to_ts = parse_date(date_to) if date_to else time.time()
+    from_ts = parse_date(date_from) if date_from else to_ts - 86400
+    return from_ts, to_ts
 
 
 class WeatherHistoryTool:
     """Инструмент для сохранения и чтения истории погоды"""
     
-    def __init__(self, json_file: str = "weather_history.json"):
+    def __init__(self, json_file: str = "weather_history.json",
+                 db_file: str = "weather_history.db", retention_days: float = 30):
+        """
+        Args:
+            json_file: старая история в JSON - переносится в базу при первом запуске
+            db_file: база SQLite с историей
+            retention_days: сколько дней хранить сырые наблюдения (None - без ограничения);
+                            дольше остаются часовые (365 дней) и суточные агрегаты
+        """
         self.name = "weather_history"
         self.description = "Работа с историей погоды"
         self.json_file = json_file
-        
-        # Создать файл если не существует
-        if not os.path.exists(self.json_file):
-            self._save_data({"city": "Warsaw", "history": []})
+        self.store = WeatherStore(db_file, retention_days=retention_days, legacy_json=json_file)
     
-    def _load_data(self) -> dict:
-        """Загрузить данные из JSON"""
-        try:
-            with open(self.json_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Ошибка чтения {self.json_file}: {e}")
-            return {"city": "Warsaw", "history": []}
-    
-    def _save_data(self, data: dict):
-        """Сохранить данные в JSON"""
-        try:
-            with open(self.json_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Ошибка записи {self.json_file}: {e}")
+    def add_weather_records(self, records: List[Dict]) -> str:
+        """
+        Добавить записи сразу для нескольких городов (одна транзакция)
+        
+        Args:
+            records: [{"city", "temperature", "windspeed", "description"}]
+        """
+        # Без общего числа записей: SUM по всей истории на каждой записи дорог
+        added = self.store.append(records)
+        return f"Записей добавлено: {added}"
     
     def add_weather_record(self, city: str, temperature: float, 
                           windspeed: float, description: str) -> str:
         """Добавить запись о погоде"""
-        data = self._load_data()
-        
-        record = {
-            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        self.store.append([{
+            "city": city,
             "temperature": temperature,
             "windspeed": windspeed,
             "description": description
-        }
-        
-        data["city"] = city
-        data["history"].append(record)
-        
-        # Ограничиваем историю последними 100 записями
-        if len(data["history"]) > 100:
-            data["history"] = data["history"][-100:]
+        }])
         
-        self._save_data(data)
-        
-        return f"Запись добавлена. Всего записей: {len(data['history'])}"
+        # Счётчик города из статистики в памяти, без прохода по истории
+        summary = self.store.aggregate(city)
+        return f"Запись добавлена. Всего записей: {summary['count']}"
     
-    def get_history(self, limit: int = None) -> str:
-        """Получить историю погоды"""
-        data = self._load_data()
-        history = data.get("history", [])
+    def get_history(self, limit: int = None, city: str = None) -> str:
+        """Получить историю погоды (city - только по одному городу)"""
+        history = self.store.history(city=city, limit=limit)
         
         if not history:
             return "История погоды пуста"
         
-        if limit:
-            history = history[-limit:]
-        
-        result = f"История погоды для {data.get('city', 'Unknown')}:\n"
-        result += f"Всего записей: {len(data.get('history', []))}\n\n"
+        result = f"История погоды для {city or 'всех городов'}:\n"
+        result += f"Всего записей: {self.store.count(city)}\n\n"
         
         if limit:
             result += f"Последние {len(history)} записей:\n"
         
         for record in history:
-            result += f"- {record['timestamp']}: {record['temperature']}°C, "
-            result += f"ветер {record['windspeed']} км/ч, {record['description']}\n"
+            if city is None:
+                result += f"- {record['timestamp']} {record['city']}: {record['temperature']}°C, "
+            else:
+                result += f"- {record['timestamp']}: {record['temperature']}°C, "
+            result += f"ветер {record['windspeed']} км/ч, {record['description']}"
+            if "until" in record:
+                result += f" (без изменений до {record['until']}, замеров: {record['samples']})"
+            result += "\n"
         
         return result.strip()
     
-    def get_statistics(self) -> str:
-        """Получить статистику по истории"""
-        data = self._load_data()
-        history = data.get("history", [])
+    def get_range(self, city: str = None, date_from: str = None, date_to: str = None,
+                  resolution: str = "auto") -> str:
+        """
+        История города за период в JSON
         
-        if not history:
+        Args:
+            date_from, date_to: границы периода (по умолчанию - последние сутки)
+            resolution: raw / 1h / 1d / auto (уровень выбирается по длине периода)
+        """
+        city = city or self.store.last_city
+        if not city:
             return "История погоды пуста"
         
-        temps = [r['temperature'] for r in history]
-        winds = [r['windspeed'] for r in history]
+        try:
+            from_ts, to_ts = parse_period(date_from, date_to, resolution)
+        except ValueError as e:
+            return f"Ошибка: {e}"
+        
+        tier, points = self.store.range(city, from_ts, to_ts, resolution)
+        return json.dumps({
+            "city": city,
+            "from": datetime.fromtimestamp(from_ts).strftime('%Y-%m-%d %H:%M'),
+            "to": datetime.fromtimestamp(to_ts).strftime('%Y-%m-%d %H:%M'),
+            "resolution": tier,
+            "points": points
+        }, ensure_ascii=False)
+    
+    def get_analytics(self, city: str = None, date_from: str = None, date_to: str = None,
+                      resolution: str = "auto", window_hours: float = 3) -> str:
+        """
+        Готовые факты за период в JSON: перцентили, тренд, скорость изменения,
+        скользящее среднее (по умолчанию - последние сутки)
+        """
+        city = city or self.store.last_city
+        if not city:
+            return "История погоды пуста"
+        
+        try:
+            from_ts, to_ts = parse_period(date_from, date_to, resolution)
+        except ValueError as e:
+            return f"Ошибка: {e}"
+        
+        result = analyze(self.store, city, from_ts, to_ts, resolution, window_hours)
+        return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+    
+    def get_statistics(self, city: str = None) -> str:
+        """Получить статистику по истории (по умолчанию - последний записанный город)"""
+        city = city or self.store.last_city
+        summary = self.store.aggregate(city) if city else None
+        
+        if not summary:
+            return "История погоды пуста"
         
         stats = {
-            "city": data.get("city", "Unknown"),
-            "total_records": len(history),
-            "period_start": history[0]['timestamp'],
-            "period_end": history[-1]['timestamp'],
-            "temperature": {
-                "min": min(temps),
-                "max": max(temps),
-                "avg": sum(temps) / len(temps)
-            },
-            "windspeed": {
-                "min": min(winds),
-                "max": max(winds),
-                "avg": sum(winds) / len(winds)
-            }
+            "city": city,
+            "total_records": summary["count"],
+            "period_start": summary["period_start"],
+            "period_end": summary["period_end"],
+            "temperature": summary["temperature"],
+            "windspeed": summary["windspeed"],
+            "windows": summary["windows"]
         }
         
         return json.dumps(stats, ensure_ascii=False, indent=2)
@@ -119,8 +170,10 @@ class WeatherHistoryTool:
         
         Действия:
         - add: добавить запись (city, temperature, windspeed, description)
-        - history: получить историю (limit - необязательно)
-        - stats: получить статистику
+        - history: получить историю (limit, city - необязательно)
+        - stats: получить статистику (city - необязательно)
+        - range: история за период (city, from, to, resolution - необязательно)
+        - analyze: тренды и перцентили за период (city, from, to, resolution, window_hours)
         """
         
         if action == "add":
@@ -132,10 +185,18 @@ class WeatherHistoryTool:
         
         elif action == "history":
             limit = kwargs.get('limit')
-            return self.get_history(limit)
+            return self.get_history(limit, kwargs.get('city'))
         
         elif action == "stats":
-            return self.get_statistics()
+            return self.get_statistics(kwargs.get('city'))
+        
+        elif action == "range":
+            return self.get_range(kwargs.get('city'), kwargs.get('from'), kwargs.get('to'),
+                                  kwargs.get('resolution', 'auto'))
+        
+        elif action == "analyze":
+            return self.get_analytics(kwargs.get('city'), kwargs.get('from'), kwargs.get('to'),
+                                      kwargs.get('resolution', 'auto'), kwargs.get('window_hours', 3))
         
         else:
             return f"Неизвестное действие: {action}"
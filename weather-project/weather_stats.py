@@ -0,0 +1,173 @@
+"""
+Статистика погоды, обновляемая при каждой записи
+Запрос статистики не перечитывает историю:
+    - за всё время: количество, мин/макс, среднее и дисперсия (алгоритм Уэлфорда)
+    - за последний час/сутки: скользящие окна на монотонных очередях
+      (мин/макс/среднее за амортизированное O(1))
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+# Скользящие окна: имя -> длина в секундах
+WINDOWS = {"last_hour": 3600, "last_day": 86400}
+METRICS = ["temperature", "windspeed"]
+
+
+class RunningStats:
+    """Количество, мин/макс, среднее и дисперсия без хранения значений"""
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0,
+                 minimum: float = None, maximum: float = None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "min": self.min,
+            "max": self.max,
+            "avg": round(self.mean, 2),
+            "stddev": round(math.sqrt(self.variance), 2),
+        }
+
+
+class SlidingWindow:
+    """Мин/макс/среднее за последние span секунд"""
+
+    def __init__(self, span: float):
+        self.span = span
+        self.samples = deque()  # (ts, value) - для суммы и количества
+        self.total = 0.0
+        # Кандидаты в минимум (возрастают) и максимум (убывают)
+        self._min = deque()
+        self._max = deque()
+
+    def add(self, ts: float, value: float):
+        self.samples.append((ts, value))
+        self.total += value
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((ts, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((ts, value))
+
+    def evict(self, now: float):
+        """Убирает значения старше окна"""
+        cutoff = now - self.span
+        while self.samples and self.samples[0][0] < cutoff:
+            self.total -= self.samples.popleft()[1]
+        for candidates in (self._min, self._max):
+            while candidates and candidates[0][0] < cutoff:
+                candidates.popleft()
+
+    def to_dict(self, now: float) -> Optional[Dict]:
+        self.evict(now)
+        if not self.samples:
+            return None
+        return {
+            "count": len(self.samples),
+            "min": self._min[0][1],
+            "max": self._max[0][1],
+            "avg": round(self.total / len(self.samples), 2),
+        }
+
+
+class CityStats:
+    """Агрегаты одного города по всем метрикам"""
+
+    def __init__(self, city: str):
+        self.city = city
+        self.first_ts = None
+        self.last_ts = None
+        self.totals = {metric: RunningStats() for metric in METRICS}
+        self.windows = {metric: {name: SlidingWindow(span) for name, span in WINDOWS.items()}
+                        for metric in METRICS}
+
+    def add(self, ts: float, values: Dict[str, float], windows_only: bool = False):
+        """Учитывает наблюдение (windows_only - итоги уже загружены из базы)"""
+        if not windows_only:
+            self.first_ts = ts if self.first_ts is None else min(self.first_ts, ts)
+            self.last_ts = ts if self.last_ts is None else max(self.last_ts, ts)
+            for metric in METRICS:
+                self.totals[metric].add(values[metric])
+        for metric in METRICS:
+            for window in self.windows[metric].values():
+                window.add(ts, values[metric])
+
+    @property
+    def count(self) -> int:
+        return self.totals[METRICS[0]].count
+
+
+class StatsIndex:
+    """Статистика всех городов (ключ - canonical_city)"""
+
+    def __init__(self):
+        self.cities: Dict[str, CityStats] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, city: str, ts: float, values: Dict[str, float]):
+        with self._lock:
+            stats = self.cities.get(key)
+            if stats is None:
+                stats = self.cities[key] = CityStats(city)
+            stats.add(ts, values)
+
+    def load_totals(self, key: str, city: str, count: int, first_ts: float, last_ts: float,
+                    totals: Dict[str, Dict]):
+        """
+        Итоги из базы при старте
+
+        Args:
+            totals: {metric: {"min", "max", "sum", "sumsq"}}
+        """
+        stats = CityStats(city)
+        stats.first_ts, stats.last_ts = first_ts, last_ts
+        for metric, t in totals.items():
+            mean = t["sum"] / count
+            stats.totals[metric] = RunningStats(
+                count=count, mean=mean, m2=max(t["sumsq"] - count * mean * mean, 0.0),
+                minimum=t["min"], maximum=t["max"])
+        with self._lock:
+            self.cities[key] = stats
+
+    def load_window_sample(self, key: str, ts: float, values: Dict[str, float]):
+        """Наблюдение за последние сутки при старте - только в окна"""
+        with self._lock:
+            if key in self.cities:
+                self.cities[key].add(ts, values, windows_only=True)
+
+    def get(self, key: str, now: float) -> Optional[Dict]:
+        """Статистика города за O(1) (амортизированно)"""
+        with self._lock:
+            stats = self.cities.get(key)
+            if stats is None or not stats.count:
+                return None
+            return {
+                "count": stats.count,
+                "first_ts": stats.first_ts,
+                "last_ts": stats.last_ts,
+                **{metric: stats.totals[metric].to_dict() for metric in METRICS},
+                "windows": {
+                    name: {metric: stats.windows[metric][name].to_dict(now) for metric in METRICS}
+                    for name in WINDOWS
+                },
+            }
@@ -0,0 +1,571 @@
+"""
+Хранилище истории погоды на SQLite (режим WAL)
+Запись - одна вставка в транзакции: время не зависит от объёма истории,
+а сбой посреди записи не портит уже сохранённые данные.
+
+    store = WeatherStore("weather_history.db", retention_days=30)
+    store.append([{"city": "Варшава", "temperature": 2.2, "windspeed": 13.3, "description": "ясно"}])
+    store.history(city="Warsaw", limit=10)
+
+При первом запуске записи из старого weather_history.json переносятся в базу.
+Статистика по городам (weather_stats.StatsIndex) строится из базы при старте
+и дальше обновляется при каждой записи - aggregate() не читает историю.
+Базу могут дописывать и другие процессы (сборщик и summary запускаются
+отдельно): по PRAGMA data_version хранилище замечает чужие записи и перед
+ответом перечитывает статистику и последние серии из базы.
+
+Уровни хранения (у каждого свой срок):
+    raw  - каждое наблюдение              (по умолчанию 30 дней)
+    1h   - мин/макс/среднее за час (UTC)  (365 дней)
+    1d   - мин/макс/среднее за сутки (UTC) (всегда)
+Часовые и суточные агрегаты обновляются в той же транзакции, что и вставка;
+range() берёт самый дешёвый уровень, подходящий под запрос.
+
+Подряд идущие одинаковые наблюдения города (температура, ветер, описание)
+хранятся одной строкой-серией: ts - с какого момента, until_ts - до какого,
+samples - сколько замеров. Агрегаты и статистика по-прежнему учитывают
+каждый замер.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from geocoder import canonical_city
+from weather_stats import METRICS, WINDOWS, StatsIndex
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    id          INTEGER PRIMARY KEY,
+    ts          REAL NOT NULL,
+    city        TEXT NOT NULL,
+    city_key    TEXT NOT NULL,
+    temperature REAL NOT NULL,
+    windspeed   REAL NOT NULL,
+    description TEXT NOT NULL,
+    until_ts    REAL,
+    samples     INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS observations_city_ts ON observations (city_key, ts);
+CREATE INDEX IF NOT EXISTS observations_ts ON observations (ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Уровень агрегации -> размер корзины в секундах
+ROLLUPS = {"1h": 3600, "1d": 86400}
+DEFAULT_ROLLUP_RETENTION = {"1h": 365, "1d": None}
+
+# auto: самый подробный уровень, у которого точек в диапазоне не больше ~750
+AUTO_MAX_SPAN = {"raw": 86400, "1h": 31 * 86400}
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_{tier} (
+    city_key TEXT NOT NULL,
+    bucket   REAL NOT NULL,
+    city     TEXT NOT NULL,
+    count    INTEGER NOT NULL,
+    first_ts REAL NOT NULL,
+    last_ts  REAL NOT NULL,
+    {columns},
+    PRIMARY KEY (city_key, bucket)
+);
+CREATE INDEX IF NOT EXISTS rollup_{tier}_bucket ON rollup_{tier} (bucket);
+"""
+
+PARTS = ["min", "max", "sum", "sumsq"]
+
+# Поля, по которым наблюдение считается неизменным
+RUN_FIELDS = ["temperature", "windspeed", "description"]
+# После перерыва в сборе дольше этого (сек) начинается новая серия
+RUN_MAX_GAP = 3600
+
+
+def _metric_columns() -> List[str]:
+    return [f"{metric}_{part}" for metric in METRICS for part in PARTS]
+
+
+def _rollup_upsert_sql(tier: str) -> str:
+    """Вставка наблюдения в корзину уровня (или обновление существующей корзины)"""
+    columns = _metric_columns()
+    merge = {"min": "MIN({c}, excluded.{c})", "max": "MAX({c}, excluded.{c})",
+             "sum": "{c} + excluded.{c}", "sumsq": "{c} + excluded.{c}"}
+    updates = [f"{c} = " + merge[c.rsplit("_", 1)[1]].format(c=c) for c in columns]
+    return (
+        f"INSERT INTO rollup_{tier} (city_key, bucket, city, count, first_ts, last_ts, "
+        f"{', '.join(columns)}) VALUES ({', '.join(['?'] * (6 + len(columns)))}) "
+        f"ON CONFLICT (city_key, bucket) DO UPDATE SET city = excluded.city, "
+        f"count = count + 1, first_ts = MIN(first_ts, excluded.first_ts), "
+        f"last_ts = MAX(last_ts, excluded.last_ts), {', '.join(updates)}"
+    )
+
+
+def _rollup_backfill_sql(tier: str, size: int) -> str:
+    """Построение уровня из сырых наблюдений (для баз, созданных до появления уровней)"""
+    aggregates = []
+    for metric in METRICS:
+        aggregates += [f"MIN({metric})", f"MAX({metric})", f"SUM({metric})", f"SUM({metric} * {metric})"]
+    return (
+        f"INSERT OR REPLACE INTO rollup_{tier} (city_key, bucket, city, count, first_ts, last_ts, "
+        f"{', '.join(_metric_columns())}) "
+        f"SELECT city_key, CAST(ts / {size} AS INTEGER) * {size} AS b, city, COUNT(*), MIN(ts), MAX(ts), "
+        f"{', '.join(aggregates)} FROM observations GROUP BY city_key, b"
+    )
+
+
+def expand_runs(ts: np.ndarray, until_ts: np.ndarray, samples: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Разворачивает серии в отдельные замеры (равномерно между ts и until_ts)
+
+    Args:
+        ts, until_ts, samples: столбцы серий (until_ts - NaN у одиночных замеров)
+
+    Returns:
+        (время каждого замера, номер его серии)
+    """
+    samples = samples.astype(np.int64)
+    run = np.repeat(np.arange(len(ts)), samples)
+    # Номер замера внутри серии: 0, 1, ..., samples - 1
+    offset = np.arange(len(run)) - np.repeat(np.cumsum(samples) - samples, samples)
+    until_ts = np.where(np.isnan(until_ts), ts, until_ts)
+    step = (until_ts - ts) / np.maximum(samples - 1, 1)
+    return ts[run] + offset * step[run], run
+
+
+def format_timestamp(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime(TIMESTAMP_FORMAT)
+
+
+def parse_timestamp(text: str) -> float:
+    return datetime.strptime(text, TIMESTAMP_FORMAT).timestamp()
+
+
+class WeatherStore:
+    """Append-only история наблюдений по городам"""
+
+    def __init__(self, db_file: str = "weather_history.db", retention_days: Optional[float] = 30,
+                 legacy_json: str = "weather_history.json", prune_interval: float = 86400,
+                 rollup_retention_days: Dict[str, Optional[float]] = None):
+        """
+        Args:
+            db_file: файл базы SQLite
+            retention_days: сколько дней хранить сырые наблюдения (None - всегда)
+            legacy_json: старый JSON-файл истории для однократного переноса
+            prune_interval: как часто (сек) удалять устаревшие записи
+            rollup_retention_days: срок хранения агрегатов {"1h": дни, "1d": дни}
+        """
+        self.db_file = db_file
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval
+        self.rollup_retention_days = dict(DEFAULT_ROLLUP_RETENTION, **(rollup_retention_days or {}))
+
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        # Счётчик изменений базы другими соединениями на момент последней сверки
+        self._data_version = None
+        self.stats = StatsIndex()
+        # Последняя серия каждого города: city_key -> (id, последний замер, температура, ветер, описание)
+        self._tails: Dict[str, tuple] = {}
+
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # WAL: читатели не блокируют запись, коммит - дозапись в журнал
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._add_run_columns()
+        for tier in ROLLUPS:
+            self.conn.executescript(ROLLUP_SCHEMA.format(
+                tier=tier, columns=",\n    ".join(f"{c} REAL NOT NULL" for c in _metric_columns())))
+        self._upsert_sql = {tier: _rollup_upsert_sql(tier) for tier in ROLLUPS}
+
+        if legacy_json:
+            self._migrate_json(legacy_json)
+
+        with self._lock:
+            self._build_rollups()
+            self._compact_runs()
+            self._prune()
+            self._sync()
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _migrate_json(self, path: str):
+        """Однократный перенос weather_history.json (файл остаётся как есть)"""
+        if not os.path.exists(path) or self._get_meta("migrated_json"):
+            return
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Не удалось прочитать {path} для переноса: {e}")
+            return
+
+        default_city = data.get("city") or "Unknown"
+        rows = [
+            (parse_timestamp(r["timestamp"]), r.get("city", default_city),
+             canonical_city(r.get("city", default_city)),
+             r["temperature"], r["windspeed"], r["description"])
+            for r in data.get("history", [])
+        ]
+
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO observations (ts, city, city_key, temperature, windspeed, description) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_json', ?)",
+                              (os.path.abspath(path),))
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_city', ?)",
+                              (default_city,))
+
+        print(f"📦 Перенесено записей из {path}: {len(rows)}")
+
+    def _add_run_columns(self):
+        """Столбцы серий для баз, созданных до их появления"""
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(observations)")}
+        with self.conn:
+            if "until_ts" not in columns:
+                self.conn.execute("ALTER TABLE observations ADD COLUMN until_ts REAL")
+            if "samples" not in columns:
+                self.conn.execute("ALTER TABLE observations ADD COLUMN samples INTEGER NOT NULL DEFAULT 1")
+
+    def _compact_runs(self):
+        """Однократно сворачивает уже накопленные повторы в серии (после построения уровней)"""
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'runs_compacted'").fetchone():
+            return
+
+        updates, removed = [], []
+        run, run_values = None, None
+        for row in self.conn.execute(
+                f"SELECT id, ts, until_ts, samples, city_key, {', '.join(RUN_FIELDS)} "
+                f"FROM observations ORDER BY city_key, ts, id"):
+            values = (row["city_key"], *(row[field] for field in RUN_FIELDS))
+            if (run is not None and values == run_values
+                    and row["ts"] - (run["until_ts"] or run["ts"]) <= RUN_MAX_GAP):
+                run["until_ts"] = row["until_ts"] or row["ts"]
+                run["samples"] += row["samples"]
+                removed.append((row["id"],))
+                continue
+            if run is not None and run["samples"] > 1:
+                updates.append((run["until_ts"], run["samples"], run["id"]))
+            run = {"id": row["id"], "ts": row["ts"], "until_ts": row["until_ts"], "samples": row["samples"]}
+            run_values = values
+        if run is not None and run["samples"] > 1:
+            updates.append((run["until_ts"], run["samples"], run["id"]))
+
+        with self.conn:
+            self.conn.executemany("UPDATE observations SET until_ts = ?, samples = ? WHERE id = ?", updates)
+            self.conn.executemany("DELETE FROM observations WHERE id = ?", removed)
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('runs_compacted', '1')")
+        if removed:
+            print(f"🗜️  Повторяющихся наблюдений свёрнуто в серии: {len(removed)}")
+
+    def _sync(self):
+        """
+        Догоняет изменения, сделанные другими соединениями (вызывается под self._lock)
+
+        PRAGMA data_version меняется только после чужих коммитов - свои записи
+        уже учтены в памяти и пересчёта не вызывают.
+        """
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        self._tails.clear()
+        self._rebuild_stats()
+        self._data_version = version
+
+    def _tail(self, key: str) -> Optional[tuple]:
+        """Последняя серия города (из памяти, при первом обращении - из базы)"""
+        if key not in self._tails:
+            row = self.conn.execute(
+                f"SELECT id, COALESCE(until_ts, ts), {', '.join(RUN_FIELDS)} FROM observations WHERE city_key = ? "
+                f"ORDER BY ts DESC, id DESC LIMIT 1", (key,)).fetchone()
+            self._tails[key] = tuple(row) if row else None
+        return self._tails[key]
+
+    def _build_rollups(self):
+        """Однократно строит уровни 1h/1d из уже накопленных наблюдений"""
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'rollups_built'").fetchone():
+            return
+        with self.conn:
+            for tier, size in ROLLUPS.items():
+                self.conn.execute(_rollup_backfill_sql(tier, size))
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rollups_built', '1')")
+
+    def append(self, records: List[Dict], ts: float = None) -> int:
+        """
+        Добавляет наблюдения одной транзакцией
+
+        Args:
+            records: [{"city", "temperature", "windspeed", "description"}]
+            ts: время наблюдения (по умолчанию - сейчас)
+        """
+        if not records:
+            return 0
+        ts = ts if ts is not None else time.time()
+
+        rows = [(ts, r["city"], canonical_city(r["city"]),
+                 r["temperature"], r["windspeed"], r["description"]) for r in records]
+
+        rollup_rows = {tier: [] for tier in ROLLUPS}
+        for row in rows:
+            values = []
+            for value in row[3:5]:
+                values += [value, value, value, value * value]
+            for tier, size in ROLLUPS.items():
+                rollup_rows[tier].append((row[2], ts // size * size, row[1], 1, ts, ts, *values))
+
+        with self._lock:
+            with self.conn:
+                # Сразу берём блокировку записи: между сверкой с базой и записью
+                # другой процесс не продлит ту же серию
+                self.conn.execute("BEGIN IMMEDIATE")
+                self._sync()
+                for row in rows:
+                    tail = self._tail(row[2])
+                    if tail is not None and tail[2:] == row[3:] and 0 <= ts - tail[1] <= RUN_MAX_GAP:
+                        # Ничего не изменилось - продлеваем серию вместо новой строки
+                        self.conn.execute(
+                            "UPDATE observations SET until_ts = ?, samples = samples + 1 WHERE id = ?",
+                            (ts, tail[0]))
+                        self._tails[row[2]] = (tail[0], ts, *row[3:])
+                    else:
+                        cursor = self.conn.execute(
+                            "INSERT INTO observations (ts, city, city_key, temperature, windspeed, description) "
+                            "VALUES (?, ?, ?, ?, ?, ?)", row)
+                        self._tails[row[2]] = (cursor.lastrowid, ts, *row[3:])
+                for tier in ROLLUPS:
+                    self.conn.executemany(self._upsert_sql[tier], rollup_rows[tier])
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_city', ?)",
+                                  (records[-1]["city"],))
+
+            for row in rows:
+                self.stats.add(row[2], row[1], ts, dict(zip(METRICS, row[3:5])))
+
+            if ts - self._last_prune >= self.prune_interval:
+                # Итоги за всё время считаются по суточному уровню - пересчёт,
+                # только если из него что-то удалено
+                if self._prune().get("1d"):
+                    self._rebuild_stats()
+
+        return len(rows)
+
+    def _retention(self, tier: str) -> Optional[float]:
+        return self.retention_days if tier == "raw" else self.rollup_retention_days.get(tier)
+
+    def _prune(self) -> Dict[str, int]:
+        """Удаляет записи старше срока хранения своего уровня, возвращает их число"""
+        self._last_prune = time.time()
+        tables = {"raw": ("observations", "COALESCE(until_ts, ts)")}
+        tables.update({tier: (f"rollup_{tier}", "bucket") for tier in ROLLUPS})
+
+        removed = {}
+        # Удалённая серия могла быть последней у города
+        self._tails.clear()
+        with self.conn:
+            for tier, (table, column) in tables.items():
+                days = self._retention(tier)
+                if days:
+                    cutoff = self._last_prune - days * 86400
+                    removed[tier] = self.conn.execute(
+                        f"DELETE FROM {table} WHERE {column} < ?", (cutoff,)).rowcount
+        return removed
+
+    def _rebuild_stats(self):
+        """Итоги по городам - по суточному уровню, окна - по записям за последние сутки"""
+        self.stats = StatsIndex()
+
+        aggregates = ", ".join(
+            f"{'SUM' if part in ('sum', 'sumsq') else part.upper()}({metric}_{part}) AS {metric}_{part}"
+            for metric in METRICS for part in PARTS)
+        rows = self.conn.execute(
+            f"SELECT city_key, city, SUM(count) AS n, MIN(first_ts) AS first_ts, "
+            f"MAX(last_ts) AS last_ts, {aggregates} FROM rollup_1d GROUP BY city_key").fetchall()
+        for row in rows:
+            totals = {metric: {part: row[f"{metric}_{part}"] for part in PARTS}
+                      for metric in METRICS}
+            self.stats.load_totals(row["city_key"], row["city"], row["n"],
+                                   row["first_ts"], row["last_ts"], totals)
+
+        since = time.time() - max(WINDOWS.values())
+        rows = self.conn.execute(
+            "SELECT ts, until_ts, samples, temperature, windspeed, city_key FROM observations "
+            "WHERE COALESCE(until_ts, ts) >= ? ORDER BY ts, id", (since,)).fetchall()
+        if not rows:
+            return
+        data = np.array([tuple(row)[:5] for row in rows], dtype=np.float64)
+        times, run = expand_runs(data[:, 0], data[:, 1], data[:, 2])
+        recent = times >= since
+        for ts, i in zip(times[recent].tolist(), run[recent].tolist()):
+            row = rows[i]
+            self.stats.load_window_sample(row["city_key"], ts, {metric: row[metric] for metric in METRICS})
+
+    @property
+    def last_city(self) -> Optional[str]:
+        return self._get_meta("last_city")
+
+    def count(self, city: str = None) -> int:
+        """Число замеров (серия из N одинаковых замеров считается за N)"""
+        with self._lock:
+            if city is None:
+                row = self.conn.execute("SELECT COALESCE(SUM(samples), 0) AS n FROM observations").fetchone()
+            else:
+                row = self.conn.execute("SELECT COALESCE(SUM(samples), 0) AS n FROM observations "
+                                        "WHERE city_key = ?", (canonical_city(city),)).fetchone()
+        return row["n"]
+
+    def history(self, city: str = None, limit: int = None) -> List[Dict]:
+        """Последние наблюдения и серии (по возрастанию времени)"""
+        query = "SELECT * FROM observations"
+        params = []
+        if city is not None:
+            query += " WHERE city_key = ?"
+            params.append(canonical_city(city))
+        query += " ORDER BY ts DESC, id DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+
+        return [self._row_to_record(row) for row in reversed(rows)]
+
+    def aggregate(self, city: str) -> Optional[Dict]:
+        """
+        Статистика города из счётчиков в памяти (к базе - только если её дописал другой процесс)
+
+        Returns:
+            {"count", "period_start", "period_end", "temperature", "windspeed", "windows"}
+        """
+        with self._lock:
+            self._sync()
+            stats = self.stats.get(canonical_city(city), time.time())
+        if stats is None:
+            return None
+        stats["period_start"] = format_timestamp(stats.pop("first_ts"))
+        stats["period_end"] = format_timestamp(stats.pop("last_ts"))
+        return stats
+
+    def _choose_tier(self, from_ts: float, to_ts: float, resolution: str) -> str:
+        """Самый дешёвый уровень, который покрывает диапазон с нужной детальностью"""
+        if resolution in ("raw", *ROLLUPS):
+            return resolution
+
+        now = time.time()
+        span = to_ts - from_ts
+        for tier in ["raw", *ROLLUPS]:
+            days = self._retention(tier)
+            covers = days is None or from_ts >= now - days * 86400
+            if covers and span <= AUTO_MAX_SPAN.get(tier, float("inf")):
+                return tier
+        return list(ROLLUPS)[-1]
+
+    def range(self, city: str, from_ts: float, to_ts: float,
+              resolution: str = "auto") -> Tuple[str, List[Dict]]:
+        """
+        Наблюдения или агрегаты города за период
+
+        Args:
+            resolution: "raw", "1h", "1d" или "auto" (самый дешёвый подходящий уровень)
+
+        Returns:
+            (уровень, точки по возрастанию времени)
+        """
+        tier = self._choose_tier(from_ts, to_ts, resolution)
+        key = canonical_city(city)
+
+        with self._lock:
+            if tier == "raw":
+                rows = self.conn.execute(
+                    "SELECT * FROM observations WHERE city_key = ? AND COALESCE(until_ts, ts) >= ? "
+                    "AND ts < ? ORDER BY ts, id", (key, from_ts, to_ts)).fetchall()
+            else:
+                rows = self.conn.execute(
+                    f"SELECT * FROM rollup_{tier} WHERE city_key = ? AND bucket >= ? AND bucket < ? "
+                    f"ORDER BY bucket", (key, from_ts // ROLLUPS[tier] * ROLLUPS[tier], to_ts)).fetchall()
+
+        if tier == "raw":
+            return tier, [self._row_to_record(row) for row in rows]
+
+        points = []
+        for row in rows:
+            point = {"timestamp": format_timestamp(row["bucket"]), "count": row["count"]}
+            for metric in METRICS:
+                point[metric] = {
+                    "min": row[f"{metric}_min"],
+                    "max": row[f"{metric}_max"],
+                    "mean": round(row[f"{metric}_sum"] / row["count"], 2),
+                }
+            points.append(point)
+        return tier, points
+
+    def _fetch_array(self, query: str, params: tuple, width: int) -> np.ndarray:
+        """Результат запроса сразу матрицей float64 (NULL -> NaN), без объектов sqlite3.Row"""
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.row_factory = None
+            rows = cursor.execute(query, params).fetchall()
+        return np.array(rows, dtype=np.float64).reshape(len(rows), width)
+
+    def columns(self, city: str, from_ts: float, to_ts: float,
+                resolution: str = "auto") -> Tuple[str, Dict[str, np.ndarray]]:
+        """
+        Данные города по столбцам (для weather_analytics)
+
+        Returns:
+            (уровень, {"ts": array, "temperature": array, "windspeed": array});
+            для агрегатов время - начало корзины, значения - средние
+        """
+        tier = self._choose_tier(from_ts, to_ts, resolution)
+        key = canonical_city(city)
+
+        if tier == "raw":
+            data = self._fetch_array(
+                "SELECT ts, until_ts, samples, temperature, windspeed FROM observations "
+                "WHERE city_key = ? AND COALESCE(until_ts, ts) >= ? AND ts < ? ORDER BY ts, id",
+                (key, from_ts, to_ts), 5)
+            # Серии разворачиваются обратно в отдельные замеры
+            times, run = expand_runs(data[:, 0], data[:, 1], data[:, 2])
+            inside = (times >= from_ts) & (times < to_ts)
+            run = run[inside]
+            return tier, {"ts": times[inside], "temperature": data[run, 3], "windspeed": data[run, 4]}
+
+        data = self._fetch_array(
+            f"SELECT bucket, temperature_sum / count, windspeed_sum / count FROM rollup_{tier} "
+            f"WHERE city_key = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+            (key, from_ts // ROLLUPS[tier] * ROLLUPS[tier], to_ts), 3)
+        return tier, {name: data[:, i] for i, name in enumerate(["ts", *METRICS])}
+
+    @staticmethod
+    def _row_to_record(row: sqlite3.Row) -> Dict:
+        record = {
+            "timestamp": format_timestamp(row["ts"]),
+            "city": row["city"],
+            "temperature": row["temperature"],
+            "windspeed": row["windspeed"],
+            "description": row["description"],
+        }
+        if row["samples"] > 1:
+            # Серия: без изменений с timestamp до until
+            record["until"] = format_timestamp(row["until_ts"])
+            record["samples"] = row["samples"]
+        return record
+
+    def close(self):
+        with self._lock:
+            self.conn.close()